@@ -0,0 +1,98 @@
+"""
+Порівняння швидкодії кастомного методу AnomalyDetector з попередньою реалізацією на циклах.
+Запуск з кореня репозиторію: python -m benchmarks.anomaly_custom_benchmark
+"""
+import time
+
+import numpy as np
+from scipy.ndimage import gaussian_filter1d
+from scipy.signal import find_peaks
+from scipy.stats import norm
+
+from tools.anomaly_detector import AnomalyDetector
+
+
+def custom_method_loop(dist, wind_size, threshold):
+    """
+    Попередня реалізація кастомного методу (послідовний цикл по пікам), збережена як еталон
+    """
+    peaks, _ = find_peaks(dist)
+    sorted_peak_indices = np.argsort(dist[peaks])[::-1]
+
+    mean_all = np.mean(dist)
+    std_error_all = np.std(dist) / np.sqrt(len(dist))
+    standard_score = norm.ppf(1 - (1 - threshold) / 2)
+    confidence_interval = mean_all + np.array([-1, 1]) * standard_score * std_error_all
+
+    anomaly_indices = []
+    for idx in sorted_peak_indices:
+        peak = peaks[idx]
+        window_start = max(0, peak - wind_size)
+        window_end = min(len(dist), peak + wind_size + 1)
+
+        window_data = np.concatenate((dist[window_start:peak], dist[peak + 1:window_end]))
+        mean_window = np.mean(window_data)
+
+        if confidence_interval[0] <= mean_window <= confidence_interval[1]:
+            correction_value = mean_window
+            anomaly_indices.append(idx)
+            for j in range(window_start, window_end):
+                dist[j] = (dist[j] + correction_value) / 2
+
+    return anomaly_indices
+
+
+def make_series(size, smoothing, anomalies_number, seed=0):
+    """
+    Генерує згладжений гаусівським фільтром шум (при smoothing=20 це близько size / 100 піків)
+    з множинними аномаліями
+    """
+    rng = np.random.default_rng(seed)
+    series = 10 + gaussian_filter1d(rng.normal(0, 1, size), smoothing)
+    anomaly_indices = rng.choice(size, anomalies_number, replace=False)
+    series[anomaly_indices] *= 1.5
+    return series
+
+
+def make_descending_peaks(size, step=3):
+    """
+    Найгірший випадок для розбиття на раунди: піки кожні step вимірів з монотонно спадною висотою,
+    тож сусідні вікна перетинаються і кожен раунд міг би звільнити лише один пік
+    """
+    series = np.full(size, 10.0)
+    series[1::step] += np.linspace(10, 0, len(series[1::step]))
+    return series
+
+
+def compare(series, wind_size, threshold):
+    """
+    Порівнює час та результат кастомного методу з циклом-еталоном
+    """
+    print(f'Розмір вибірки: {len(series)}, кількість піків: {len(find_peaks(series)[0])}, вікно: {wind_size}')
+
+    peaks, _ = find_peaks(series)
+    reference = series.copy()
+    start = time.perf_counter()
+    reference_indices = peaks[custom_method_loop(reference, wind_size, threshold)].tolist()
+    loop_time = time.perf_counter() - start
+
+    vectorized = series.copy()
+    detector = AnomalyDetector('custom')
+    start = time.perf_counter()
+    detector.detect_and_clean(vectorized, wind_size, threshold, inplace=True)
+    vectorized_time = time.perf_counter() - start
+
+    print(f'Цикл: {loop_time:.3f} с, векторизовано: {vectorized_time:.3f} с, '
+          f'прискорення: {loop_time / vectorized_time:.1f}x')
+    print(f'Скориговано піків: {len(reference_indices)} / {len(detector._found_anomaly_indices)}, '
+          f'однаковий порядок: {reference_indices == detector._found_anomaly_indices}, '
+          f'макс. розбіжність значень: {np.max(np.abs(reference - vectorized)):.3e}')
+
+
+def main(size=10 ** 6, smoothing=20, wind_size=10, threshold=0.95):
+    compare(make_series(size, smoothing, anomalies_number=size // 1000), wind_size, threshold)
+    compare(make_descending_peaks(size // 10), wind_size, threshold)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Порівняння швидкодії ядер RecurrentFilter з попередньою реалізацією на циклах з np.array.
+Запуск з кореня репозиторію: python -m benchmarks.recurrent_filter_benchmark [розмір ...]
+"""
+import sys
+import time
+
+import numpy as np
+
+from models.filter_kernels import NUMBA_AVAILABLE
+from models.recurrent_filtration import RecurrentFilter
+
+
+def _update_alpha(n):
+    return (2 * (2 * n - 1)) / (n * (n + 1))
+
+
+def _update_beta(n):
+    return 6 / (n * (n + 1))
+
+
+def alpha_beta_loop(dist):
+    """
+    Попередня реалізація альфа-бета фільтру, збережена як еталон
+    """
+    Yin = np.zeros((len(dist), 1))
+    YoutAB = np.zeros((len(dist), 1))
+    T0 = 1
+    for i in range(len(dist)):
+        Yin[i, 0] = float(dist[i])
+
+    Yspeed_retro = (Yin[1, 0] - Yin[0, 0]) / T0
+    Yextra = Yin[0, 0] + Yspeed_retro
+    alpha = _update_alpha(1)
+    beta = _update_beta(1)
+    YoutAB[0, 0] = Yin[0, 0] + alpha * (Yin[0, 0])
+
+    for i in range(1, len(dist)):
+        error = Yin[i, 0] - Yextra
+
+        YoutAB[i, 0] = Yextra + alpha * error
+        Yspeed = Yspeed_retro + (beta / T0) * error
+        Yspeed_retro = Yspeed
+        Yextra = YoutAB[i, 0] + Yspeed_retro
+        alpha = _update_alpha(i)
+        beta = _update_beta(i)
+
+    return YoutAB
+
+
+def alpha_beta_gamma_loop(dist):
+    """
+    Попередня реалізація альфа-бета-гамма фільтру, збережена як еталон
+    """
+    Yin = np.zeros((len(dist), 1))
+    YoutABG = np.zeros((len(dist), 1))
+    T0 = 1
+    for i in range(len(dist)):
+        Yin[i, 0] = float(dist[i])
+
+    Yspeed_retro = (Yin[1, 0] - Yin[0, 0]) / T0
+    Yaccel_retro = 0
+    Yextra = Yin[0, 0] + Yspeed_retro
+
+    base_alpha = _update_alpha(1)
+    beta = _update_beta(1)
+    gamma = 0.001
+
+    YoutABG[0, 0] = Yin[0, 0] + base_alpha * (Yin[0, 0])
+
+    for i in range(1, len(dist)):
+        error = Yin[i, 0] - Yextra
+        accuracy_penalty = 1.0 / (1.0 + abs(error))
+
+        alpha = base_alpha * accuracy_penalty
+        beta = beta * accuracy_penalty
+        gamma = gamma * accuracy_penalty
+
+        YoutABG[i, 0] = Yextra + alpha * error
+        Yspeed = Yspeed_retro + (beta / T0) * error
+        Yaccel = Yaccel_retro + (gamma / T0) * error
+
+        Yspeed_retro = Yspeed
+        Yaccel_retro = Yaccel
+
+        Yextra = YoutABG[i, 0] + Yspeed + 0.5 * Yaccel * T0
+
+    return YoutABG
+
+
+def _time_call(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main(sizes=(10 ** 5, 10 ** 6, 10 ** 7), reference_limit=10 ** 6):
+    """
+    :param sizes: розміри вибірок для порівняння
+    :param reference_limit: максимальний розмір, для якого запускається повільна еталонна реалізація
+    """
+    rng = np.random.default_rng(0)
+    references = {'alpha-beta': alpha_beta_loop, 'alpha-beta-gamma': alpha_beta_gamma_loop}
+    backends = [False, True] if NUMBA_AVAILABLE else [False]
+
+    if NUMBA_AVAILABLE:
+        # Перший виклик компілює ядра, його не враховуємо
+        for filter_type in references:
+            RecurrentFilter(filter_type, use_jit=True).process(np.arange(3.0))
+
+    for size in sizes:
+        dist = np.linspace(0, 100, size) + rng.normal(0, 1, size)
+        for filter_type, reference in references.items():
+            line = f'{filter_type:>16} | n={size:>9} |'
+            reference_result, reference_time = None, None
+            if size <= reference_limit:
+                reference_result, reference_time = _time_call(reference, dist)
+                line += f' цикл: {reference_time:8.3f} с |'
+
+            for use_jit in backends:
+                recurrent_filter = RecurrentFilter(filter_type, use_jit=use_jit)
+                _, elapsed = _time_call(recurrent_filter.process, dist)
+                line += f' {"numba" if use_jit else "python"}: {elapsed:8.3f} с'
+                if reference_time is not None:
+                    deviation = np.max(np.abs(recurrent_filter.get_processed_dist() - reference_result))
+                    line += f' ({reference_time / elapsed:6.1f}x, похибка {deviation:.1e})'
+                line += ' |'
+            print(line)
+
+
+if __name__ == '__main__':
+    main(tuple(int(size) for size in sys.argv[1:]) or (10 ** 5, 10 ** 6, 10 ** 7))
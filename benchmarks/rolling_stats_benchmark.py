@@ -0,0 +1,63 @@
+"""
+Перевірка точності та швидкодії RollingStatistics на рядах з трендом та великим зсувом,
+еталон - np.std / np.mean по вікнах sliding_window_view.
+Запуск з кореня репозиторію: python -m benchmarks.rolling_stats_benchmark
+"""
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from tools.anomaly_detector import AnomalyDetector
+from tools.rolling_stats import RollingStatistics
+
+
+def window_stats_reference(dist, wind_size, windows_per_chunk=10 ** 5):
+    """
+    Точні ковзні середнє та стандартне відхилення, порахувані по вікнах частинами
+    """
+    windows = sliding_window_view(dist, wind_size)
+    means = np.concatenate([windows[start:start + windows_per_chunk].mean(axis=1)
+                            for start in range(0, len(windows), windows_per_chunk)])
+    stds = np.concatenate([windows[start:start + windows_per_chunk].std(axis=1)
+                           for start in range(0, len(windows), windows_per_chunk)])
+    return means, stds
+
+
+def make_series(size, seed=0):
+    """
+    Ряди, на яких різниці глобальних кумулятивних сум втрачають точність
+    """
+    rng = np.random.default_rng(seed)
+    noise = rng.normal(0, 1, size)
+    positions = np.arange(size, dtype=np.float64)
+    return {
+        'лінійний тренд': positions + noise,
+        'квадратичний тренд': (positions / 1000) ** 2 * 1000 + noise,
+        'зсув 1e9': 1e9 + noise,
+        'стаціонарний шум': noise,
+    }
+
+
+def main(size=10 ** 6, wind_sizes=(5, 20, 500), threshold=3):
+    for name, series in make_series(size).items():
+        for wind_size in wind_sizes:
+            start = time.perf_counter()
+            rolling_stats = RollingStatistics(series, wind_size)
+            elapsed = time.perf_counter() - start
+
+            means, stds = window_stats_reference(series, wind_size)
+            mean_error = np.max(np.abs(rolling_stats.get_mean() - means))
+            std_error = np.max(np.abs(rolling_stats.get_std() - stds))
+
+            detector = AnomalyDetector('sliding_wind')
+            detector.detect_and_clean(series, wind_size, threshold)
+            reference_anomalies = np.flatnonzero(np.abs(series[wind_size - 1:] - means) > threshold * stds)
+            mismatched = len(np.setxor1d(detector._found_anomaly_indices, reference_anomalies + wind_size - 1))
+
+            print(f'{name}, вікно {wind_size}: {elapsed:.3f} с, макс. похибка середнього {mean_error:.2e}, '
+                  f'стандартного відхилення {std_error:.2e}, розбіжних аномалій {mismatched}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,30 @@
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 from ortools.sat.python import cp_model
+from scipy import sparse
+
+from dss.linear_parser import SENSES, parse_linear_constraint, parse_linear_expression
+
+
+SolveResult = namedtuple('SolveResult', ['status', 'objective', 'values', 'wall_time'])
+
+
+def _solve_scenario(spec):
+    """
+    Будує та розв'язує модель одного сценарію. Функція рівня модуля, щоб її можна було виконати в пулі процесів
+    (CpModel не серіалізується, тому процесу передається лише опис сценарію)
+    :param spec: словник опису сценарію (формується у solve_many)
+    :return: SolveResult
+    """
+    model = LinearProgrammingModel(spec['min_value'], spec['max_value'], spec['number_of_x'])
+    model._bounds = spec['bounds']
+    model.set_constraints(spec['target_func'], spec['constraint_list'])
+    for matrix, rhs, sense in spec['matrix_constraints']:
+        model.add_matrix_constraints(matrix, rhs, sense)
+    return model.solve(time_limit=spec['time_limit'], workers=spec['workers'], hint=spec['hint'])
 
 
 class LinearProgrammingModel:
@@ -8,36 +34,275 @@ class LinearProgrammingModel:
         self._max_value = max_value
         self._model = cp_model.CpModel()
         self._variables = {}
+        self._bounds = {}
+        self._target_func = None
+        self._constraint_list = []
+        self._matrix_constraints = []
+        self._switchable_constraints = {}
+        self._next_constraint_key = 0  # Ключі не перевикористовуються після remove_constraint
+        self._last_result = None
 
     def set_constraints(self, target_func, constraint_list):
-        for i in range(self._number_of_x):
-            var_name = f'X{i + 1}'
-            self._variables[var_name] = self._model.NewIntVar(self._min_value, self._max_value, var_name)
+        """
+        Створює змінні X1..Xn (лише при першому виклику), додає обмеження та встановлює цільову функцію.
+        Вирази розбираються парсером лінійних виразів (без eval) у розріджені вектори коефіцієнтів,
+        з яких обмеження будуються через LinearExpr. Повторний виклик використовує ті самі змінні,
+        додає нові обмеження та замінює цільову функцію
+        :param target_func: кортеж (цільова функція текстом, 'minimize' або 'maximize')
+        :param constraint_list: список обмежень текстом, наприклад ['X1 + 2*X2 <= 10', 'X1 - X3 >= 0']
+        """
+        if not self._variables:
+            for i in range(self._number_of_x):
+                var_name = f'X{i + 1}'
+                min_value, max_value = self._bounds.get(var_name, (self._min_value, self._max_value))
+                self._variables[var_name] = self._model.NewIntVar(min_value, max_value, var_name)
 
+        self._constraint_list.extend(constraint_list)
         for constraint in constraint_list:
-            try:
-                self._model.Add(eval(constraint, {}, self._variables))
-            except Exception as e:
-                print(f"Error adding constraint {constraint}: {e}")
+            self._model.Add(self._compile_constraint(constraint))
+
+        self.set_objective(target_func)
 
+    def set_objective(self, target_func):
+        """
+        Замінює цільову функцію моделі без її перебудови
+        :param target_func: кортеж (цільова функція текстом, 'minimize' або 'maximize')
+        """
         func, condition = target_func
+        terms, constant = parse_linear_expression(func)
+        objective = self._get_weighted_sum(terms, func) + constant
+
+        self._model.ClearObjective()
+        if 'minimize' in condition.lower():
+            self._model.Minimize(objective)
+        elif 'maximize' in condition.lower():
+            self._model.Maximize(objective)
+        else:
+            raise Exception("Допустимі значення умови цільової функції: 'minimize' та 'maximize'")
+        self._target_func = target_func
+
+    def set_bounds(self, bounds):
+        """
+        Змінює межі змінних у вже побудованій моделі (домен змінної змінюється на місці)
+        :param bounds: словник {назва змінної: (мінімум, максимум)}
+        """
+        for var_name, (min_value, max_value) in bounds.items():
+            if var_name not in self._variables:
+                raise Exception(f'Невідома змінна {var_name}')
+            if min_value > max_value:
+                raise Exception(f'Мінімум змінної {var_name} перевищує максимум')
+            self._bounds[var_name] = (min_value, max_value)
+            self._set_domain(self._variables[var_name], min_value, max_value)
+
+    def add_switchable_constraint(self, constraint, enabled=True):
+        """
+        Додає обмеження, що діє лише коли увімкнений його літерал (OnlyEnforceIf), тож його можна
+        вмикати та вимикати між розв'язаннями без перебудови моделі
+        :param constraint: обмеження текстом
+        :param enabled: чи діє обмеження одразу
+        :return: ключ обмеження для enable_constraint / disable_constraint / remove_constraint
+        """
+        if not self._variables:
+            raise Exception('Перед додаванням обмежень викличте set_constraints()')
+
+        key = self._next_constraint_key
+        self._next_constraint_key += 1
+        literal = self._model.NewBoolVar(f'enforce_{key}')
+        self._model.Add(self._compile_constraint(constraint)).OnlyEnforceIf(literal)
+        self._switchable_constraints[key] = [constraint, literal, None]
+        self._switch_constraint(key, enabled)
+        return key
+
+    def enable_constraint(self, key):
+        """
+        :param key: ключ з add_switchable_constraint
+        """
+        self._switch_constraint(key, True)
+
+    def disable_constraint(self, key):
+        """
+        :param key: ключ з add_switchable_constraint
+        """
+        self._switch_constraint(key, False)
+
+    def remove_constraint(self, key):
+        """
+        Вимикає обмеження назавжди: його літерал фіксується в 0, тож розв'язувач його не враховує
+        :param key: ключ з add_switchable_constraint
+        """
+        self._switch_constraint(key, False)
+        del self._switchable_constraints[key]
+
+    def _switch_constraint(self, key, enabled):
+        """
+        Фіксує літерал обмеження в 1 (діє) або 0 (не діє)
+        :param key: ключ з add_switchable_constraint
+        :param enabled: чи діє обмеження
+        """
+        if key not in self._switchable_constraints:
+            raise Exception(f'Невідоме обмеження {key}')
+        entry = self._switchable_constraints[key]
+        entry[2] = enabled
+        self._set_domain(entry[1], int(enabled), int(enabled))
+
+    def _set_domain(self, variable, min_value, max_value):
+        """
+        Замінює домен змінної у proto моделі
+        :param variable: змінна CpModel
+        :param min_value: нова нижня межа
+        :param max_value: нова верхня межа
+        """
+        domain = self._model.Proto().variables[variable.Index()].domain
+        domain[0] = min_value
+        domain[1] = max_value
+
+    def _get_active_constraints(self):
+        """
+        :return: список текстових обмежень, що зараз діють (постійні та увімкнені перемикані)
+        """
+        return self._constraint_list + [constraint for constraint, _, enabled
+                                        in self._switchable_constraints.values() if enabled]
+
+    def _compile_constraint(self, constraint):
+        """
+        :param constraint: обмеження текстом
+        :return: BoundedLinearExpression для CpModel.Add
+        """
+        terms, sense, rhs = parse_linear_constraint(constraint)
+        return SENSES[sense](self._get_weighted_sum(terms, constraint), rhs)
+
+    def add_matrix_constraints(self, matrix, rhs, sense='<='):
+        """
+        Додає обмеження виду A @ x (sense) b, заданих щільною np.array чи розрідженою scipy.sparse матрицею.
+        Стовпці матриці відповідають змінним X1..Xn
+        :param matrix: матриця коефіцієнтів розміром (кількість обмежень, number_of_x)
+        :param rhs: вектор правих частин
+        :param sense: знак обмежень ('<=', '>=', '==', '!=') - спільний або список для кожного рядка
+        """
+        if not self._variables:
+            raise Exception('Перед додаванням обмежень викличте set_constraints()')
+
+        matrix = sparse.csr_matrix(matrix)
+        rhs = np.asarray(rhs).ravel()
+        if matrix.shape[1] != self._number_of_x or matrix.shape[0] != len(rhs):
+            raise Exception('Розмір матриці обмежень має бути (len(rhs), number_of_x)')
+        if not (np.array_equal(matrix.data, np.round(matrix.data)) and np.array_equal(rhs, np.round(rhs))):
+            raise Exception('Коефіцієнти та праві частини обмежень мають бути цілими числами')
+
+        senses = [sense] * len(rhs) if isinstance(sense, str) else list(sense)
+        if len(senses) != len(rhs) or any(row_sense not in SENSES for row_sense in senses):
+            raise Exception('Допустимі знаки обмежень: ' + ', '.join(SENSES))
+        self._matrix_constraints.append((matrix, rhs, senses))
+
+        variables = list(self._variables.values())
+        data = matrix.data.astype(np.int64).tolist()
+        indices = matrix.indices.tolist()
+        for row, (row_start, row_end) in enumerate(zip(matrix.indptr[:-1], matrix.indptr[1:])):
+            expression = cp_model.LinearExpr.WeightedSum([variables[i] for i in indices[row_start:row_end]],
+                                                         data[row_start:row_end])
+            self._model.Add(SENSES[senses[row]](expression, int(rhs[row])))
+
+    def _get_weighted_sum(self, terms, text):
+        """
+        :param terms: пари (назва змінної, коефіцієнт) з парсера
+        :param text: вихідний вираз (для повідомлення про помилку)
+        :return: LinearExpr
+        """
         try:
-            if 'minimize' in condition.lower():
-                self._model.Minimize(eval(func, {}, self._variables))
-            elif 'maximize' in condition.lower():
-                self._model.Maximize(eval(func, {}, self._variables))
-        except Exception as e:
-            print(f"Error setting objective function {func}: {e}")
+            variables = [self._variables[var_name] for var_name, _ in terms]
+        except KeyError as e:
+            raise Exception(f'Невідома змінна {e.args[0]} у виразі: {text}')
+        return cp_model.LinearExpr.WeightedSum(variables, [coefficient for _, coefficient in terms])
+
+    def solve(self, time_limit=None, workers=None, hint=None, warm_start=False):
+        """
+        Розв'язує модель та повертає результат замість виводу в консоль
+        :param time_limit: обмеження часу пошуку в секундах, None - без обмеження
+        :param workers: кількість потоків пошуку CP-SAT (num_search_workers), None - значення розв'язувача
+        :param hint: словник {назва змінної: значення} - початкове рішення для пошуку,
+        наприклад values попереднього SolveResult
+        :param warm_start: True - якщо hint не передано, підказкою стає рішення попереднього виклику solve()
+        :return: SolveResult (назва статусу, значення цільової функції, словник значень змінних, час у секундах)
+        """
+        if hint is None and warm_start and self._last_result is not None:
+            hint = self._last_result.values
+
+        self._model.ClearHints()
+        for var_name, value in (hint or {}).items():
+            if var_name in self._variables:
+                self._model.AddHint(self._variables[var_name], value)
 
-    def get_solutions(self):
         solver = cp_model.CpSolver()
-        print("Solving the model...")
+        if time_limit is not None:
+            solver.parameters.max_time_in_seconds = time_limit
+        if workers is not None:
+            solver.parameters.num_search_workers = workers
+
         status = solver.Solve(self._model)
-        print("Solver status:", status)
+        if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            objective = solver.ObjectiveValue()
+            values = {var_name: solver.Value(var) for var_name, var in self._variables.items()}
+        else:
+            objective, values = None, {}
+
+        self._last_result = SolveResult(solver.StatusName(status), objective, values, solver.WallTime())
+        return self._last_result
+
+    def solve_many(self, scenarios, processes=None, workers=1, time_limit=None, warm_start=False):
+        """
+        Розв'язує набір варіантів моделі, що відрізняються межами змінних, цільовою функцією чи додатковими
+        обмеженнями. Сценарії розподіляються між процесами; кожен розв'язувач використовує workers потоків
+        :param scenarios: список словників з необов'язковими ключами:
+        'bounds' - {назва змінної: (мінімум, максимум)}, 'target_func' - кортеж як у set_constraints,
+        'constraints' - додаткові обмеження, 'hint' - {назва змінної: значення}, 'time_limit' - секунди
+        :param processes: кількість процесів, None - кількість ядер, 1 - послідовно в поточному процесі
+        :param workers: кількість потоків пошуку CP-SAT на один сценарій
+        :param time_limit: обмеження часу на сценарій за замовчуванням
+        :param warm_start: True - сценарії без 'hint' отримують як підказку попереднє рішення:
+        при послідовному розв'язанні - рішення попереднього сценарію, у пулі - останнє рішення solve()
+        :return: список SolveResult у порядку сценаріїв
+        """
+        if self._target_func is None:
+            raise Exception('Перед розв\'язанням сценаріїв викличте set_constraints()')
+
+        specs = []
+        for scenario in scenarios:
+            hint = scenario.get('hint')
+            if hint is None and warm_start and self._last_result is not None:
+                hint = self._last_result.values
+            specs.append({
+                'min_value': self._min_value,
+                'max_value': self._max_value,
+                'number_of_x': self._number_of_x,
+                'target_func': scenario.get('target_func', self._target_func),
+                'constraint_list': self._get_active_constraints() + list(scenario.get('constraints', [])),
+                'matrix_constraints': self._matrix_constraints,
+                'bounds': {**self._bounds, **scenario.get('bounds', {})},
+                'hint': hint,
+                'time_limit': scenario.get('time_limit', time_limit),
+                'workers': workers,
+            })
+
+        processes = processes or os.cpu_count() or 1
+        if processes == 1 or len(specs) <= 1:
+            results = []
+            for scenario, spec in zip(scenarios, specs):
+                if warm_start and 'hint' not in scenario and results and results[-1].values:
+                    spec['hint'] = results[-1].values
+                results.append(_solve_scenario(spec))
+            return results
+
+        with ProcessPoolExecutor(max_workers=min(processes, len(specs))) as executor:
+            return list(executor.map(_solve_scenario, specs))
+
+    def get_solutions(self):
+        print("Solving the model...")
+        result = self.solve()
+        print("Solver status:", result.status)
 
-        if status == cp_model.OPTIMAL:
-            print(f'Оптимальне значення цільової функції: {solver.ObjectiveValue()}')
-            for var_name, var in self._variables.items():
-                print(f'{var_name} = {solver.Value(var)}')
+        if result.status == 'OPTIMAL':
+            print(f'Оптимальне значення цільової функції: {result.objective}')
+            for var_name, value in result.values.items():
+                print(f'{var_name} = {value}')
         else:
-            print('Оптимальне рішення не знайдено.')
\ No newline at end of file
+            print('Оптимальне рішення не знайдено.')
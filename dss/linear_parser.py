@@ -0,0 +1,235 @@
+import operator
+import re
+from functools import lru_cache
+
+
+# Знаки обмежень та відповідні їм оператори порівняння
+SENSES = {
+    '<=': operator.le,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+_TOKEN_PATTERN = re.compile(r'''\s*(?:
+    (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)
+    |(?P<name>[A-Za-z_]\w*)
+    |(?P<compare><=|>=|==|!=|<|>)
+    |(?P<operator>[-+*()])
+)''', re.VERBOSE)
+
+# Найпоширеніша форма - сума доданків виду 'c*X', 'X' чи 'c' без дужок - розбирається регулярними виразами
+_FLAT_TERM = r'(?:\d+\s*\*\s*)?(?:[A-Za-z_]\w*|\d+)'
+_FLAT_SIDE = rf'\s*[+-]?\s*{_FLAT_TERM}(?:\s*[+-]\s*{_FLAT_TERM})*\s*'
+_FLAT_EXPRESSION = re.compile(_FLAT_SIDE)
+_FLAT_CONSTRAINT = re.compile(rf'({_FLAT_SIDE})(<=|>=|==|!=|<|>)({_FLAT_SIDE})')
+_FLAT_TERMS = re.compile(r'([+-]?)\s*(?:(\d+)\s*\*\s*)?(?:([A-Za-z_]\w*)|(\d+))')
+
+
+def _to_integer(value, text):
+    """
+    :param value: числовий коефіцієнт
+    :param text: вихідний вираз (для повідомлення про помилку)
+    :return: коефіцієнт як int - CP-SAT працює лише з цілими коефіцієнтами
+    """
+    if value != int(value):
+        raise Exception(f'Коефіцієнти виразу мають бути цілими числами: {text}')
+    return int(value)
+
+
+def _parse_flat_side(side, scale, coefficients):
+    """
+    Розбирає частину виразу, що відповідає _FLAT_SIDE
+    :param side: текст частини виразу
+    :param scale: множник частини (1 - ліва, -1 - права частина обмеження)
+    :param coefficients: словник {назва змінної: коефіцієнт}, доповнюється на місці
+    :return: вільний член (помножений на scale)
+    """
+    constant = 0
+    for sign, coefficient, name, number in _FLAT_TERMS.findall(side):
+        value = scale * (int(coefficient) if coefficient else 1)
+        if sign == '-':
+            value = -value
+        if name:
+            coefficients[name] = coefficients.get(name, 0) + value
+        else:
+            constant += value * int(number)
+    return constant
+
+
+class _ExpressionParser:
+    """
+    Рекурсивний спуск по токенах лінійного виразу:
+    вираз := доданок (('+' | '-') доданок)*, доданок := множник ('*' множник)*,
+    множник := ('+' | '-') множник | число | змінна | '(' вираз ')'.
+    Використовується для виразів з дужками; код виразу ніколи не виконується
+    """
+    def __init__(self, text):
+        """
+        Розбиває текст на токени
+        :param text: вираз текстом
+        """
+        self._text = text
+        self._tokens = []
+        position = 0
+        for match in _TOKEN_PATTERN.finditer(text):
+            if match.start() != position:
+                break
+            position = match.end()
+            self._tokens.append((match.lastgroup, match.group(match.lastgroup)))
+        if text[position:].strip():
+            raise self._error(f'недопустимий символ на позиції {position}')
+        self._tokens.append(('end', None))
+        self._position = 0
+
+    def _error(self, reason):
+        """
+        :param reason: опис помилки
+        :return: Exception з текстом виразу
+        """
+        return Exception(f'Не вдалося розібрати вираз {self._text}: {reason}')
+
+    def _peek(self):
+        return self._tokens[self._position]
+
+    def _next(self):
+        token = self._tokens[self._position]
+        self._position += 1
+        return token
+
+    def expect_end(self):
+        """
+        Перевіряє, що вираз розібрано повністю
+        """
+        kind, value = self._peek()
+        if kind != 'end':
+            raise self._error(f"зайвий токен '{value}'")
+
+    def comparison(self):
+        """
+        :return: знак порівняння, якщо наступний токен є порівнянням, інакше None
+        """
+        kind, value = self._peek()
+        if kind != 'compare':
+            return None
+        self._next()
+        return value
+
+    def expression(self, scale, coefficients):
+        """
+        Розбирає вираз, додаючи помножені на scale коефіцієнти змінних у спільний словник
+        :param scale: множник виразу
+        :param coefficients: словник {назва змінної: коефіцієнт}, доповнюється на місці
+        :return: вільний член (помножений на scale)
+        """
+        constant = self.term(scale, coefficients)
+        while self._peek() in (('operator', '+'), ('operator', '-')):
+            sign = 1 if self._next()[1] == '+' else -1
+            constant += self.term(sign * scale, coefficients)
+        return constant
+
+    def term(self, scale, coefficients):
+        """
+        Розбирає добуток множників, з яких лише один може містити змінні
+        :param scale: множник доданку
+        :param coefficients: словник {назва змінної: коефіцієнт}, доповнюється на місці
+        :return: вільний член (помножений на scale)
+        """
+        factor_coefficients = {}
+        constant = self.factor(factor_coefficients)
+        while self._peek() == ('operator', '*'):
+            self._next()
+            next_coefficients = {}
+            next_constant = self.factor(next_coefficients)
+            if factor_coefficients and next_coefficients:
+                raise Exception(f'Вираз не є лінійним (добуток змінних): {self._text}')
+            if next_coefficients:
+                factor_coefficients = {name: value * constant for name, value in next_coefficients.items()}
+            else:
+                factor_coefficients = {name: value * next_constant for name, value in factor_coefficients.items()}
+            constant *= next_constant
+
+        for name, value in factor_coefficients.items():
+            coefficients[name] = coefficients.get(name, 0) + scale * value
+        return scale * constant
+
+    def factor(self, coefficients):
+        """
+        :param coefficients: порожній словник для коефіцієнтів змінних множника
+        :return: вільний член множника
+        """
+        kind, value = self._next()
+        if kind == 'number':
+            return float(value) if any(symbol in value for symbol in '.eE') else int(value)
+        if kind == 'name':
+            coefficients[value] = 1
+            return 0
+        if (kind, value) in (('operator', '+'), ('operator', '-')):
+            sign = 1 if value == '+' else -1
+            constant = self.factor(coefficients)
+            for name in coefficients:
+                coefficients[name] *= sign
+            return sign * constant
+        if (kind, value) == ('operator', '('):
+            constant = self.expression(1, coefficients)
+            if self._next() != ('operator', ')'):
+                raise self._error("очікувалась ')'")
+            return constant
+        if kind == 'end':
+            raise self._error('неочікуваний кінець виразу')
+        raise self._error(f"неочікуваний токен '{value}'")
+
+
+@lru_cache(maxsize=65536)
+def parse_linear_expression(text):
+    """
+    Розбирає лінійний вираз (наприклад '3*X1 + 2*(X2 - X3) + 5') без виконання коду.
+    Результат кешується, тож повторна побудова моделі з тими ж виразами не розбирає їх заново
+    :param text: вираз текстом
+    :return: кортеж (кортеж пар (назва змінної, коефіцієнт) з ненульовими коефіцієнтами, вільний член)
+    """
+    coefficients = {}
+    if _FLAT_EXPRESSION.fullmatch(text):
+        constant = _parse_flat_side(text, 1, coefficients)
+    else:
+        parser = _ExpressionParser(text)
+        constant = parser.expression(1, coefficients)
+        parser.expect_end()
+
+    terms = tuple((name, _to_integer(value, text)) for name, value in coefficients.items() if value)
+    return terms, _to_integer(constant, text)
+
+
+@lru_cache(maxsize=65536)
+def parse_linear_constraint(text):
+    """
+    Розбирає лінійне обмеження (наприклад 'X1 + X2 <= 10' чи '2*X1 == X2 + 4'), переносячи всі змінні вліво,
+    а вільні члени - вправо. Строгі нерівності перетворюються на нестрогі (змінні цілочисельні)
+    :param text: обмеження текстом
+    :return: кортеж (кортеж пар (назва змінної, коефіцієнт), знак з SENSES, права частина)
+    """
+    coefficients = {}
+    flat_match = _FLAT_CONSTRAINT.fullmatch(text)
+    if flat_match:
+        left_side, sense, right_side = flat_match.groups()
+        left_constant = _parse_flat_side(left_side, 1, coefficients)
+        right_constant = _parse_flat_side(right_side, -1, coefficients)
+    else:
+        parser = _ExpressionParser(text)
+        left_constant = parser.expression(1, coefficients)
+        sense = parser.comparison()
+        if sense is None:
+            raise Exception(f'Обмеження має містити одне порівняння (<=, >=, ==, !=, <, >): {text}')
+        right_constant = parser.expression(-1, coefficients)
+        if parser.comparison() is not None:
+            raise Exception(f'Обмеження має містити одне порівняння (<=, >=, ==, !=, <, >): {text}')
+        parser.expect_end()
+
+    terms = tuple((name, _to_integer(value, text)) for name, value in coefficients.items() if value)
+    rhs = _to_integer(-right_constant - left_constant, text)
+
+    if sense == '<':
+        sense, rhs = '<=', rhs - 1
+    elif sense == '>':
+        sense, rhs = '>=', rhs + 1
+    return terms, sense, rhs
@@ -1,132 +1,282 @@
+from collections import namedtuple
+
 import pandas as pd
 import numpy as np
-from collections import defaultdict
 from matplotlib import pyplot as plt
 
+from tools.data_loader import read_spreadsheet
+
+
+SensitivityResult = namedtuple('SensitivityResult',
+                               ['winners', 'win_counts', 'baseline_option', 'baseline_ranks', 'stability'])
+
 
 class MulticriteriaDecision:
     """
-
+    Багатокритеріальне оцінювання опцій за інтегральною оцінкою нормалізованих ознак
     """
     def __init__(self, excel_table):
         """
 
-        :param excel_table: шлях до Excel таблиці з даними
+        :param excel_table: шлях до Excel таблиці з даними або pd.DataFrame з тими ж стовпцями
         """
-        self._data = pd.read_excel(excel_table)
-        self._feature_names = self._data['Features'].to_list()
-        self._condition_map = self._data['Condition'].to_list()
-        self._priority_map = self._data['Priority'].to_list()
-        self._option_names = []
-        self._normalized_features = defaultdict()
+        if isinstance(excel_table, pd.DataFrame):
+            self._data = excel_table
+        else:
+            self._data = read_spreadsheet(excel_table)
 
-        self._data_matrix = self._get_matrix_view()
-        self._get_normalized_features()
+        sample_data = self._data.drop(columns=['Condition', 'Features', 'Priority'])
+        self._set_data(data_matrix=sample_data.to_numpy(dtype=np.float64),
+                       condition_map=self._data['Condition'].to_list(),
+                       priority_map=self._data['Priority'].to_list(),
+                       feature_names=self._data['Features'].to_list(),
+                       option_names=sample_data.columns.tolist())
 
-    def make_decision(self):
+    @classmethod
+    def from_matrix(cls, data_matrix, condition_map, priority_map, feature_names=None, option_names=None):
         """
+        Створює об'єкт напряму з матриці ознак, без таблиці. Підходить для великої кількості опцій
+        (сотні тисяч і більше), які не поміщаються в Excel
+        :param data_matrix: np.array розміром (кількість ознак, кількість опцій)
+        :param condition_map: для кожної ознаки 'min' чи 'max' - напрям оптимізації
+        :param priority_map: пріоритети ознак
+        :param feature_names: назви ознак, за замовчуванням їх порядкові номери
+        :param option_names: назви опцій, за замовчуванням їх порядкові номери
+        :return: об'єкт MulticriteriaDecision
+        """
+        decision = cls.__new__(cls)
+        decision._data = None
+        decision._set_data(data_matrix, condition_map, priority_map, feature_names, option_names)
+        return decision
 
-        :return:
+    def _set_data(self, data_matrix, condition_map, priority_map, feature_names=None, option_names=None):
+        """
+        Зберігає матрицю ознак та параметри оцінювання, вираховує нормалізовану матрицю та вагові коефіцієнти
+        :param data_matrix: np.array розміром (кількість ознак, кількість опцій)
+        :param condition_map: для кожної ознаки 'min' чи 'max'
+        :param priority_map: пріоритети ознак
+        :param feature_names: назви ознак
+        :param option_names: назви опцій
         """
-        integral = np.zeros(self._data_matrix.shape[1])
-        weights = defaultdict()
+        self._data_matrix = np.ascontiguousarray(data_matrix, dtype=np.float64)
+        features_number, options_number = self._data_matrix.shape
+
+        self._condition_map = list(condition_map)
+        self._priority_map = list(priority_map)
+        self._feature_names = list(feature_names) if feature_names is not None else list(range(features_number))
+        self._option_names = list(option_names) if option_names is not None else list(range(options_number))
 
-        # Вираховуємо вагові коефіцієнти
-        for i in range(len(self._priority_map)):
-            weights[f'feature_{i}_weight'] = self._priority_map[i] / sum(self._priority_map)
+        if not len(self._condition_map) == len(self._priority_map) == features_number:
+            raise Exception('Кількість умов та пріоритетів має відповідати кількості ознак')
 
-        # Вираховуємо інтегральні оцінки
-        for i in range(self._data_matrix.shape[1]):
-            integral[i] = 0
-            for j in range(self._data_matrix.shape[0]):
-                weight_coefficient = weights[f'feature_{j}_weight']
-                normalized_feature = self._normalized_features[f'norm_feature_{j}'][i]
+        self._is_max_condition = np.array([condition == 'max' for condition in self._condition_map], dtype=bool)
+        self._normalized_matrix = self._get_normalized_matrix()
+        self._weights = self._get_weights(self._priority_map)
 
-                integral[i] += weight_coefficient * (1 - normalized_feature) ** (-1)
+    def make_decision(self, print_table=True):
+        """
+        Вираховує інтегральні оцінки опцій та визначає оптимальний варіант
+        :param print_table: виводити таблицю оцінок всіх опцій та оптимальний варіант
+        :return: назва оптимальної опції
+        """
+        integral = self._get_integral()
 
         # Приймаємо рішення по найнижчому інтегралу
-        opt = 0
-        min_value = 1000
-        for i in range(self._data_matrix.shape[1]):
-            if min_value > integral[i]:
-                min_value = integral[i]
-                opt = i
-        print('| Назва опції | Інтегрована оцінка |')
-        for option, score in zip(self._option_names, integral):
-            print(f'| {option} | {score} |')
-        print('Оптимальний варіант:', self._option_names[opt])
+        opt = int(np.argmin(integral))
+        if print_table:
+            print('| Назва опції | Інтегрована оцінка |')
+            for option, score in zip(self._option_names, integral):
+                print(f'| {option} | {score} |')
+            print('Оптимальний варіант:', self._option_names[opt])
 
-    def show_plot(self):
+        return self._option_names[opt]
+
+    def get_ranking(self, top_k=None):
+        """
+        Повертає рейтинг опцій за зростанням інтегральної оцінки (найкраща опція перша)
+        :param top_k: кількість найкращих опцій, None - повний рейтинг
+        :return: pd.DataFrame зі стовпцями 'option' та 'score'
         """
+        return self._select_ranking(self._get_integral(), np.asarray(self._option_names, dtype=object), top_k)
 
-        :return:
+    @staticmethod
+    def _select_ranking(scores, option_names, top_k):
+        """
+        Відбирає top_k найменших оцінок частковим упорядкуванням (argpartition) і сортує лише їх
+        :param scores: вектор інтегральних оцінок
+        :param option_names: масив назв опцій тієї ж довжини
+        :param top_k: кількість найкращих опцій, None - всі опції
+        :return: pd.DataFrame зі стовпцями 'option' та 'score'
         """
-        for i, (_, values) in enumerate(self._normalized_features.items()):
-            plt.plot(values, label=self._feature_names[i])
+        if top_k is not None and top_k < len(scores):
+            selected = np.argpartition(scores, top_k - 1)[:top_k] if top_k > 0 else np.empty(0, dtype=np.int64)
+            selected = selected[np.argsort(scores[selected], kind='stable')]
+        else:
+            selected = np.argsort(scores, kind='stable')
 
-        plt.title('Normalized values of all features')
-        plt.xlabel('Options')
-        plt.ylabel('Normalized Values')
-        plt.legend()
-        plt.grid(True)
-        plt.show()
+        return pd.DataFrame({'option': option_names[selected], 'score': scores[selected]})
+
+    @staticmethod
+    def iter_matrix_blocks(data_matrix, block_size, option_names=None):
+        """
+        Нарізає матрицю ознак (наприклад np.memmap) на блоки стовпців-опцій для rank_chunked()
+        :param data_matrix: np.array чи np.memmap розміром (кількість ознак, кількість опцій)
+        :param block_size: кількість опцій у блоці
+        :param option_names: назви опцій, за замовчуванням їх порядкові номери
+        :return: генератор кортежів (назви опцій блоку, блок матриці)
+        """
+        for start in range(0, data_matrix.shape[1], block_size):
+            end = min(start + block_size, data_matrix.shape[1])
+            names = np.arange(start, end) if option_names is None else option_names[start:end]
+            yield names, data_matrix[:, start:end]
 
-    def _get_normalized_features(self):
+    @classmethod
+    def rank_chunked(cls, blocks_factory, condition_map, priority_map, top_k=None):
+        """
+        Рейтинг опцій, що читаються блоками стовпців, для каталогів більших за пам'ять.
+        Нормалізація потребує сум по всіх опціях, тож дані проходяться двічі: перший прохід рахує суми
+        рядків, другий - інтегральні оцінки. При заданому top_k в пам'яті тримаються лише top_k кандидатів
+        :param blocks_factory: функція без аргументів, що при кожному виклику повертає новий ітератор
+        кортежів (назви опцій, блок матриці розміром (кількість ознак, кількість опцій блоку)),
+        наприклад lambda: MulticriteriaDecision.iter_matrix_blocks(memmap, 100000)
+        :param condition_map: для кожної ознаки 'min' чи 'max'
+        :param priority_map: пріоритети ознак
+        :param top_k: кількість найкращих опцій, None - повний рейтинг
+        :return: pd.DataFrame зі стовпцями 'option' та 'score'
         """
+        is_max_condition = np.array([condition == 'max' for condition in condition_map], dtype=bool)
+        weights = cls._get_weights(priority_map)
+
+        # Перший прохід: суми рядків для нормалізації
+        row_sums = np.zeros(len(is_max_condition))
+        for _, block in blocks_factory():
+            block = np.asarray(block, dtype=np.float64)
+            row_sums += np.where(is_max_condition[:, np.newaxis], 1 / block, block).sum(axis=1)
+
+        # Другий прохід: інтегральні оцінки блоками з відбором кандидатів
+        best_scores = np.empty(0)
+        best_names = np.empty(0, dtype=object)
+        for names, block in blocks_factory():
+            block = np.asarray(block, dtype=np.float64)
+            normalized = np.where(is_max_condition[:, np.newaxis], 1 / block, block) / row_sums[:, np.newaxis]
+            scores = weights.dot(cls._get_complement_reciprocal(normalized))
+
+            best_scores = np.concatenate((best_scores, scores))
+            best_names = np.concatenate((best_names, np.asarray(names, dtype=object)))
+            if top_k is not None and len(best_scores) > top_k:
+                kept = np.argpartition(best_scores, top_k - 1)[:top_k] if top_k > 0 else np.empty(0, dtype=np.int64)
+                kept.sort()  # Зберігаємо порядок надходження опцій для стабільного рейтингу
+                best_scores = best_scores[kept]
+                best_names = best_names[kept]
+
+        return cls._select_ranking(best_scores, best_names, top_k)
 
-        :return:
+    def sensitivity_analysis(self, weight_matrix, block_size=65536):
         """
-        features = defaultdict()
-        sum_features = defaultdict()
-        norm_features = defaultdict()
+        Аналіз чутливості рішення до вагових коефіцієнтів: оцінює всі сценарії пріоритетів одразу
+        матричним множенням (сценарії x ознаки) · (1 - normalized)^(-1) по блоках опцій,
+        використовуючи вже вирахувану нормалізовану матрицю
+        :param weight_matrix: np.array розміром (кількість сценаріїв, кількість ознак) з пріоритетами,
+        кожен рядок нормується до суми 1 так само як Priority
+        :param block_size: кількість опцій, що оцінюються за одне множення (обмежує пам'ять)
+        :return: SensitivityResult з переможцем кожного сценарію, статистикою перемог опцій, базовим
+        рішенням (за поточними пріоритетами), його місцем у рейтингу кожного сценарію та часткою сценаріїв,
+        в яких воно лишається оптимальним
+        """
+        weights = np.atleast_2d(np.asarray(weight_matrix, dtype=np.float64))
+        if weights.shape[1] != self._data_matrix.shape[0]:
+            raise Exception('Кількість стовпців матриці ваг має відповідати кількості ознак')
+        weights = weights / weights.sum(axis=1, keepdims=True)
 
-        # Отримуємо масиви рядків та їх суми
-        for i in range(self._data_matrix.shape[0]):
-            # отримуємо рядки
-            feature_array = self._get_row_array(i)
-            features[f'feature_{i}'] = feature_array
+        complement_reciprocal = self._get_complement_reciprocal(self._normalized_matrix)
+        baseline = int(np.argmin(self._weights.dot(complement_reciprocal)))
+        baseline_scores = weights.dot(complement_reciprocal[:, baseline])
 
-            # отримуємо суми рядків
-            if self._condition_map[i] == 'max':
-                feature_array = 1 / feature_array
+        best_scores = np.full(weights.shape[0], np.inf)
+        best_indices = np.zeros(weights.shape[0], dtype=np.int64)
+        better_than_baseline = np.zeros(weights.shape[0], dtype=np.int64)
 
-            sum_features[f'sum_feature_{i}'] = sum(feature_array)
+        for start in range(0, complement_reciprocal.shape[1], block_size):
+            scores = weights.dot(complement_reciprocal[:, start:start + block_size])
 
-        # Отримуємо нормалізовані масиви
-        for i in range(self._data_matrix.shape[0]):
-            norm_features[f'norm_feature_{i}'] = np.zeros(features[f'feature_{i}'].shape)
-            for j in range(self._data_matrix.shape[1]):
-                feature_cell = features[f'feature_{i}'][j]
+            block_best = np.argmin(scores, axis=1)
+            block_best_scores = scores[np.arange(len(scores)), block_best]
+            improved = block_best_scores < best_scores
+            best_scores[improved] = block_best_scores[improved]
+            best_indices[improved] = block_best[improved] + start
 
-                if self._condition_map[i] == 'max':
-                    feature_cell = 1 / feature_cell
+            is_better = scores < baseline_scores[:, np.newaxis]
+            if start <= baseline < start + block_size:
+                is_better[:, baseline - start] = False  # Сама базова опція не може бути кращою за себе
+            better_than_baseline += np.count_nonzero(is_better, axis=1)
 
-                norm_features[f'norm_feature_{i}'][j] = feature_cell / sum_features[f'sum_feature_{i}']
+        option_names = np.asarray(self._option_names, dtype=object)
+        wins = np.bincount(best_indices, minlength=len(option_names))
+        winners_order = np.flatnonzero(wins)[np.argsort(-wins[np.flatnonzero(wins)], kind='stable')]
+        win_counts = pd.DataFrame({
+            'option': option_names[winners_order],
+            'wins': wins[winners_order],
+            'share': wins[winners_order] / weights.shape[0],
+        })
 
-        self._normalized_features = norm_features
+        return SensitivityResult(
+            winners=option_names[best_indices],
+            win_counts=win_counts,
+            baseline_option=option_names[baseline],
+            baseline_ranks=better_than_baseline + 1,
+            stability=float(np.mean(best_indices == baseline)),
+        )
 
-    def _get_matrix_view(self):
+    def show_plot(self):
         """
-
-        :return:
+        Відображує нормалізовані значення всіх ознак по опціях
         """
-        sample_data = self._data.drop(columns=['Condition', 'Features', 'Priority'])
-        data_matrix = np.zeros(sample_data.shape)
-        self._option_names = sample_data.columns.tolist()
-
-        for i in range(sample_data.shape[1]):
-            data_matrix[:, i] = sample_data.iloc[:, i]
+        for feature_name, values in zip(self._feature_names, self._normalized_matrix):
+            plt.plot(values, label=feature_name)
 
-        return data_matrix
+        plt.title('Normalized values of all features')
+        plt.xlabel('Options')
+        plt.ylabel('Normalized Values')
+        plt.legend()
+        plt.grid(True)
+        plt.show()
 
-    def _get_row_array(self, row_number):
+    @staticmethod
+    def _get_weights(priority_map):
+        """
+        Вираховує вагові коефіцієнти ознак як частки їх пріоритетів
+        :param priority_map: пріоритети ознак
+        :return: вектор ваг у вигляді np.array
         """
+        priorities = np.asarray(priority_map, dtype=np.float64)
+        return priorities / priorities.sum()
 
-        :return:
+    def _get_integral(self):
         """
-        row_array = np.zeros(self._data_matrix.shape[1])
+        Вираховує інтегральні оцінки всіх опцій одним матрично-векторним добутком:
+        integral = weights · (1 - normalized)^(-1)
+        :return: вектор інтегральних оцінок у вигляді np.array
+        """
+        return self._weights.dot(self._get_complement_reciprocal(self._normalized_matrix))
 
-        for i in range(self._data_matrix.shape[1]):
-            row_array[i] = self._data_matrix[row_number, i]
+    @staticmethod
+    def _get_complement_reciprocal(normalized_matrix):
+        """
+        :param normalized_matrix: нормалізована матриця ознак
+        :return: (1 - normalized_matrix)^(-1), вирахувана в одному буфері
+        """
+        reciprocal = np.subtract(1.0, normalized_matrix)
+        np.reciprocal(reciprocal, out=reciprocal)
+        return reciprocal
 
-        return row_array
+    def _get_normalized_matrix(self):
+        """
+        Нормалізує матрицю ознак за один прохід: для ознак що максимізуються береться обернене значення,
+        після чого кожен рядок ділиться на свою суму
+        :return: нормалізована матриця розміром (кількість ознак, кількість опцій)
+        """
+        normalized = self._data_matrix.copy()
+        for i in np.flatnonzero(self._is_max_condition):
+            np.reciprocal(normalized[i], out=normalized[i])
+        normalized /= normalized.sum(axis=1, keepdims=True)
+        return normalized
@@ -4,11 +4,13 @@ import matplotlib.pyplot as plt
 
 class Additive:
 
-    def __init__(self, trend, rand_distr):
+    def __init__(self, trend, rand_distr, out=None):
         """
         Приймає дві вибірки та об'єднує їх в адитивну модель
         :param trend: вибірка котру вважаємо трендом
         :param rand_distr: вибірка котру вважаємо похибкою
+        :param out: опціональний буфер (наприклад np.memmap з create_series) для запису моделі без
+        створення нового масиву
         """
         if type(rand_distr) is tuple:
             self._rand_distr = rand_distr[0]
@@ -19,7 +21,7 @@ class Additive:
 
         self._trend = trend[0]
         self._trend_type = trend[1].lower()
-        self._additive_model = self._trend + self._rand_distr
+        self._additive_model = np.add(self._trend, self._rand_distr, out=out)
 
     def show_plot(self):
         """
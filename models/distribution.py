@@ -2,52 +2,98 @@ import numpy as np
 import matplotlib.pyplot as plt
 from scipy.stats import norm, uniform, expon
 
+from tools.histogram import StreamingHistogram
+from tools.series_io import DEFAULT_CHUNK_SIZE
+
 
 class Distribution:
+    _DENSITY_GRID_SIZE = 1000  # Кількість точок графіку щільності за замовчуванням
 
-    def __init__(self, dist_type):
+    def __init__(self, dist_type, rng=None):
         """
         Визначає заданий закон розподілу майбутньої вибірки
         :param dist_type: назва закону розподілу текстом
+        :param rng: np.random.Generator або seed для відтворюваної генерації, None - глобальний стан np.random
         """
         self._dist_type = dist_type
+        self._rng = None if rng is None else np.random.default_rng(rng)
         self._is_normal = 'normal' in dist_type.lower()
         self._is_uniform = 'uniform' in dist_type.lower()
         self._is_exponential = 'exponential' in dist_type.lower()
         self._distribution = None
         self._density_func = None
         self._linear_space = None
+        self._histogram = None
         self._data_dict = {}
 
         if True not in [self._is_normal, self._is_uniform, self._is_exponential]:
             raise Exception("Допустимі значення закону розподілу: 'Normal', 'Uniform' та 'Exponential'")
 
-    def create_distribution(self, size, **kwargs):
+    def create_distribution(self, size, out=None, summary=False, bins=30, grid_size=None, **kwargs):
         """
         Створює вибірку за заданими параметрами та законом розподілу, передає дані для побудови графіку
         :param size: об'єм вибірки
+        :param out: опціональний буфер довжини size (наприклад np.memmap з create_series), у який вибірка
+        генерується блоками без створення проміжних масивів на всю довжину
+        :param summary: True - генерувати вибірку блоками та зберігати лише мінімум, максимум і гістограму
+        (сама вибірка зберігається тільки якщо передано out)
+        :param bins: кількість інтервалів гістограми у режимі summary
+        :param grid_size: кількість точок графіку щільності, None - не більше _DENSITY_GRID_SIZE
         :param kwargs: спеціальні параметри для обраного типу розподілу
         """
+        sampler, density = self._get_distribution_functions(**kwargs)
+
+        if out is not None and len(out) != size:
+            raise Exception('Довжина буфера out має дорівнювати розміру вибірки')
+
+        self._histogram = StreamingHistogram(bins) if summary else None
+
+        if out is None and not summary:
+            self._distribution = sampler(size)
+            min_value, max_value = np.min(self._distribution), np.max(self._distribution)
+        else:
+            min_value, max_value = np.inf, -np.inf
+            for start in range(0, size, DEFAULT_CHUNK_SIZE):
+                chunk = sampler(min(DEFAULT_CHUNK_SIZE, size - start))
+                if out is not None:
+                    out[start:start + len(chunk)] = chunk
+                if summary:
+                    self._histogram.update(chunk)
+                else:
+                    min_value = min(min_value, chunk.min())
+                    max_value = max(max_value, chunk.max())
+            if summary:
+                min_value, max_value = self._histogram.min, self._histogram.max
+            self._distribution = out
+
+        self._linear_space = np.linspace(min_value, max_value, min(size, grid_size or self._DENSITY_GRID_SIZE))
+        self._density_func = density(self._linear_space)
+
+    def _get_distribution_functions(self, **kwargs):
+        """
+        Перевіряє параметри обраного закону розподілу
+        :param kwargs: спеціальні параметри для обраного типу розподілу
+        :return: кортеж (функція генерації n випадкових значень, функція щільності ймовірності)
+        """
+        random = np.random if self._rng is None else self._rng
+
         if self._is_normal:
             if kwargs['sigma'] <= 0:
                 raise Exception('sigma не може бути менше або дорівнювати 0')
 
-            self._distribution = np.random.normal(kwargs['mu'], kwargs['sigma'], size)
-            self._linear_space = np.linspace(min(self._distribution), max(self._distribution), len(self._distribution))
-            self._density_func = norm.pdf(self._linear_space, loc=kwargs['mu'], scale=kwargs['sigma'])
+            return (lambda n: random.normal(kwargs['mu'], kwargs['sigma'], n),
+                    lambda x: norm.pdf(x, loc=kwargs['mu'], scale=kwargs['sigma']))
 
         elif self._is_uniform:
             min_value = kwargs['min_val']
             max_value = kwargs['max_val']
 
-            self._distribution = np.random.uniform(min_value, max_value, size)
-            self._linear_space = np.linspace(min(self._distribution), max(self._distribution), len(self._distribution))
-            self._density_func = uniform.pdf(self._linear_space, loc=min_value, scale=max_value - min_value)
+            return (lambda n: random.uniform(min_value, max_value, n),
+                    lambda x: uniform.pdf(x, loc=min_value, scale=max_value - min_value))
 
         elif self._is_exponential:
-            self._distribution = np.random.exponential(scale=1 / kwargs['lambda_'], size=size)
-            self._linear_space = np.linspace(min(self._distribution), max(self._distribution), len(self._distribution))
-            self._density_func = expon.pdf(self._linear_space, scale=1 / kwargs['lambda_'])
+            return (lambda n: random.exponential(scale=1 / kwargs['lambda_'], size=n),
+                    lambda x: expon.pdf(x, scale=1 / kwargs['lambda_']))
 
     def show_plot(self):
         """
@@ -63,13 +109,24 @@ class Distribution:
             plt.title('Експоненційний розподіл ВВ')
 
         plt.plot(self._linear_space, self._density_func, label="Щільність ймовірності $f(x)$")
-        plt.hist(self._distribution, bins=30, density=True, alpha=0.5, edgecolor='black', label="Випадкові числа")
+        if self._histogram is not None:
+            counts, edges = self._histogram.get_histogram()
+            plt.hist(edges[:-1], bins=edges, weights=counts, density=True, alpha=0.5, edgecolor='black',
+                     label="Випадкові числа")
+        else:
+            plt.hist(self._distribution, bins=30, density=True, alpha=0.5, edgecolor='black', label="Випадкові числа")
         plt.xlabel('Значення $x$')
         plt.ylabel('Щільність ймовірності $f(x)$')
         plt.legend()
         plt.grid(True)
         plt.show()
 
+    def get_histogram(self):
+        """
+        :return: StreamingHistogram вибірки, створеної в режимі summary (None в інших режимах)
+        """
+        return self._histogram
+
     def get_distribution(self):
         """
         :return: f(x) вибірка відповідно до застосованого закону у вигляді numpy.array() та тип закону розподілу текстом
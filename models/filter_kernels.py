@@ -0,0 +1,276 @@
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+# Порядок полів у масиві стану фільтру
+STATE_FIELDS = ('position', 'speed', 'acceleration', 'n', 'alpha', 'beta', 'gamma')
+
+
+def initial_state(channels=None):
+    """
+    Формує стан фільтру до обробки першого виміру
+    :param channels: кількість каналів, None - одновимірна вибірка
+    :return: np.array float64 розміром (7,) або (7, channels) з полями у порядку STATE_FIELDS
+    """
+    shape = (len(STATE_FIELDS),) if channels is None else (len(STATE_FIELDS), channels)
+    state = np.zeros(shape)
+    state[4] = 1.0  # alpha(1)
+    state[5] = 3.0  # beta(1)
+    state[6] = 0.001  # початкове gamma
+    return state
+
+
+def _alpha_beta_loop(values, out, extrapolated, state):
+    """
+    Рекурсія альфа-бета фільтру над суцільним буфером, що продовжує роботу з переданого стану.
+    Коефіцієнти alpha та beta вираховуються на місці без виклику функцій, тож код однаково працює
+    і як скомпільоване Numba ядро, і як чистий Python
+    :param values: вхідні виміри (np.array float64 або список)
+    :param out: буфер відфільтрованих значень тієї ж довжини
+    :param extrapolated: буфер екстрапольованих на наступний крок значень тієї ж довжини
+    :param state: стан фільтру (поля STATE_FIELDS), оновлюється на місці
+    """
+    position = state[0]
+    speed = state[1]
+    n = int(state[3])
+    alpha = state[4]
+    beta = state[5]
+
+    for k in range(len(values)):
+        if n == 0:
+            out[k] = values[k] + alpha * values[k]
+            position = values[k]
+            extrapolated[k] = np.nan
+        else:
+            if n == 1:
+                speed = values[k] - position
+            extra = position + speed
+            error = values[k] - extra
+
+            out[k] = extra + alpha * error
+            speed = speed + beta * error
+            position = out[k]
+            extrapolated[k] = position + speed
+            alpha = (2.0 * (2 * n - 1)) / (n * (n + 1))
+            beta = 6.0 / (n * (n + 1))
+        n += 1
+
+    state[0] = position
+    state[1] = speed
+    state[3] = n
+    state[4] = alpha
+    state[5] = beta
+
+
+def _alpha_beta_gamma_loop(values, out, extrapolated, state):
+    """
+    Рекурсія альфа-бета-гамма фільтру, що адаптує коефіцієнти на основі точності кожного передбачення
+    :param values: вхідні виміри (np.array float64 або список)
+    :param out: буфер відфільтрованих значень тієї ж довжини
+    :param extrapolated: буфер екстрапольованих на наступний крок значень тієї ж довжини
+    :param state: стан фільтру (поля STATE_FIELDS), оновлюється на місці
+    """
+    position = state[0]
+    speed = state[1]
+    accel = state[2]
+    n = int(state[3])
+    base_alpha = state[4]
+    beta = state[5]
+    gamma = state[6]
+
+    for k in range(len(values)):
+        if n == 0:
+            out[k] = values[k] + base_alpha * values[k]
+            position = values[k]
+            extrapolated[k] = np.nan
+        else:
+            if n == 1:
+                speed = values[k] - position
+                accel = 0.0  # Початкове прискорення
+            extra = position + speed + 0.5 * accel
+            error = values[k] - extra
+
+            # Проста адаптація параметрів на основі помилки
+            accuracy_penalty = 1.0 / (1.0 + abs(error))
+            alpha = base_alpha * accuracy_penalty
+            beta = beta * accuracy_penalty
+            gamma = gamma * accuracy_penalty
+
+            out[k] = extra + alpha * error
+            speed = speed + beta * error
+            accel = accel + gamma * error
+            position = out[k]
+            extrapolated[k] = position + speed + 0.5 * accel
+        n += 1
+
+    state[0] = position
+    state[1] = speed
+    state[2] = accel
+    state[3] = n
+    state[5] = beta
+    state[6] = gamma
+
+
+def _alpha_beta_rows(values, out, extrapolated, state):
+    """
+    Альфа-бета фільтр для кількох каналів одночасно: стан та коефіцієнти кожного каналу зберігаються
+    у векторах, тож один крок циклу за часом оновлює всі канали
+    :param values: np.array float64 розміром (кількість вимірів, кількість каналів)
+    :param out: буфер відфільтрованих значень того ж розміру
+    :param extrapolated: буфер екстрапольованих на наступний крок значень того ж розміру
+    :param state: стан фільтру розміром (7, кількість каналів), оновлюється на місці
+    """
+    position = state[0].copy()
+    speed = state[1].copy()
+    n = int(state[3, 0]) if state.shape[1] else 0
+    alpha = state[4].copy()
+    beta = state[5].copy()
+
+    for k in range(values.shape[0]):
+        if n == 0:
+            out[k] = values[k] + alpha * values[k]
+            position = values[k].copy()
+            extrapolated[k] = np.nan
+        else:
+            if n == 1:
+                speed = values[k] - position
+            extra = position + speed
+            error = values[k] - extra
+
+            out[k] = extra + alpha * error
+            speed = speed + beta * error
+            position = out[k].copy()
+            extrapolated[k] = position + speed
+            alpha[:] = (2.0 * (2 * n - 1)) / (n * (n + 1))
+            beta[:] = 6.0 / (n * (n + 1))
+        n += 1
+
+    state[0] = position
+    state[1] = speed
+    state[3] = n
+    state[4] = alpha
+    state[5] = beta
+
+
+def _alpha_beta_gamma_rows(values, out, extrapolated, state):
+    """
+    Альфа-бета-гамма фільтр для кількох каналів одночасно, коефіцієнти адаптуються окремо для кожного каналу
+    :param values: np.array float64 розміром (кількість вимірів, кількість каналів)
+    :param out: буфер відфільтрованих значень того ж розміру
+    :param extrapolated: буфер екстрапольованих на наступний крок значень того ж розміру
+    :param state: стан фільтру розміром (7, кількість каналів), оновлюється на місці
+    """
+    position = state[0].copy()
+    speed = state[1].copy()
+    accel = state[2].copy()
+    n = int(state[3, 0]) if state.shape[1] else 0
+    base_alpha = state[4].copy()
+    beta = state[5].copy()
+    gamma = state[6].copy()
+
+    for k in range(values.shape[0]):
+        if n == 0:
+            out[k] = values[k] + base_alpha * values[k]
+            position = values[k].copy()
+            extrapolated[k] = np.nan
+        else:
+            if n == 1:
+                speed = values[k] - position
+                accel = np.zeros(values.shape[1])  # Початкове прискорення
+            extra = position + speed + 0.5 * accel
+            error = values[k] - extra
+
+            # Проста адаптація параметрів на основі помилки
+            accuracy_penalty = 1.0 / (1.0 + np.abs(error))
+            alpha = base_alpha * accuracy_penalty
+            beta = beta * accuracy_penalty
+            gamma = gamma * accuracy_penalty
+
+            out[k] = extra + alpha * error
+            speed = speed + beta * error
+            accel = accel + gamma * error
+            position = out[k].copy()
+            extrapolated[k] = position + speed + 0.5 * accel
+        n += 1
+
+    state[0] = position
+    state[1] = speed
+    state[2] = accel
+    state[3] = n
+    state[5] = beta
+    state[6] = gamma
+
+
+if NUMBA_AVAILABLE:
+    _compiled_kernels = {
+        ('alpha-beta', 1): njit(cache=True)(_alpha_beta_loop),
+        ('alpha-beta-gamma', 1): njit(cache=True)(_alpha_beta_gamma_loop),
+        ('alpha-beta', 2): njit(cache=True)(_alpha_beta_rows),
+        ('alpha-beta-gamma', 2): njit(cache=True)(_alpha_beta_gamma_rows),
+    }
+else:
+    _compiled_kernels = {}
+
+_python_kernels = {
+    ('alpha-beta', 1): _alpha_beta_loop,
+    ('alpha-beta-gamma', 1): _alpha_beta_gamma_loop,
+    ('alpha-beta', 2): _alpha_beta_rows,
+    ('alpha-beta-gamma', 2): _alpha_beta_gamma_rows,
+}
+
+
+def run_filter(filter_type, values, state=None, use_jit=None):
+    """
+    Виконує рекурсію обраного фільтру над вибіркою, продовжуючи з переданого стану.
+    Якщо встановлено Numba, використовується скомпільоване ядро над суцільним буфером float64,
+    інакше - той самий цикл над списками Python (без індексування np.array та викликів методів на кожному кроці).
+    Двовимірна вибірка (кількість вимірів, кількість каналів) фільтрується векторно по всіх каналах за один прохід
+    :param filter_type: 'alpha-beta' або 'alpha-beta-gamma'
+    :param values: вибірка у вигляді одновимірного np.array або двовимірного (час, канали)
+    :param state: стан фільтру від initial_state() чи попереднього виклику, None - почати з нуля.
+    Оновлюється на місці
+    :param use_jit: True/False для примусового вибору реалізації, None - автоматичний вибір
+    :return: кортеж (відфільтровані значення, екстрапольовані на наступний крок значення, стан фільтру)
+    """
+    if use_jit is None:
+        use_jit = NUMBA_AVAILABLE
+    if use_jit and not NUMBA_AVAILABLE:
+        raise Exception('Numba не встановлено, скомпільоване ядро недоступне')
+
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    if values.ndim > 2:
+        raise Exception('Підтримуються лише одновимірні вибірки та двовимірні (час, канали)')
+    if values.ndim < 2:
+        values = values.ravel()
+    channels = values.shape[1] if values.ndim == 2 else None
+
+    if state is None:
+        state = initial_state(channels)
+    if state.shape != initial_state(channels).shape:
+        raise Exception('Стан фільтру не відповідає кількості каналів вибірки')
+
+    kernel_key = (filter_type, values.ndim)
+
+    if use_jit:
+        out = np.empty_like(values)
+        extrapolated = np.empty_like(values)
+        _compiled_kernels[kernel_key](values, out, extrapolated, state)
+        return out, extrapolated, state
+
+    if values.ndim == 2:
+        out = np.empty_like(values)
+        extrapolated = np.empty_like(values)
+        _python_kernels[kernel_key](values, out, extrapolated, state)
+        return out, extrapolated, state
+
+    out = [0.0] * len(values)
+    extrapolated = [0.0] * len(values)
+    state_list = state.tolist()
+    _python_kernels[kernel_key](values.tolist(), out, extrapolated, state_list)
+    state[:] = state_list
+    return np.array(out), np.array(extrapolated), state
@@ -1,95 +1,342 @@
+import time
+from collections import namedtuple
+
 import numpy as np
 import matplotlib.pyplot as plt
+from numpy.polynomial.chebyshev import chebval, chebvander
+
+from tools.series_io import iter_chunks
+
+
+RegressionMetrics = namedtuple('RegressionMetrics', ['r2', 'mae', 'rmse', 'mape'])
+BatchFit = namedtuple('BatchFit', ['coefficients', 'forecasts', 'r2'])
 
 
 class Predictive:
     """
     Презентує функіонал предиктивної моделі, що базується на МНК
     """
-    def __init__(self, dist, third_polynomial_degree=False):
+    _CHUNK_SIZE = 65536  # Кількість рядків матриці ознак, що формуються та розкладаються за один крок
+    _RESCALE_FACTOR = 2  # У скільки разів довжина вибірки може перевищити нормування індексів до його оновлення
+
+    def __init__(self, dist, third_polynomial_degree=False, degree=2, forgetting_factor=1.0):
         """
         Ініціалізує клас
         :param dist: вибірка у вигляді np.array
-        :param third_polynomial_degree: активує опцію застосування поліному 3 порядку до МНК методу
+        :param third_polynomial_degree: застаріла опція, еквівалентна degree=3
+        :param degree: степінь поліному що застосовується до МНК методу
+        :param forgetting_factor: коефіцієнт експоненційного забування (0, 1]. Вимір, що на k кроків старший
+        за останній, входить у МНК з вагою forgetting_factor**k. 1.0 - усі виміри рівноцінні
         """
+        if third_polynomial_degree:
+            degree = 3
+        if isinstance(degree, (bool, np.bool_)) or not isinstance(degree, (int, np.integer)):
+            raise Exception('Степінь поліному має бути цілим числом')
+        if degree < 0:
+            raise Exception('Степінь поліному не може бути від\'ємним')
+        if not 0 < forgetting_factor <= 1:
+            raise Exception('Коефіцієнт забування має бути в межах (0, 1]')
+
         self._distribution = dist
-        self._third_polynomial_degree = third_polynomial_degree
+        self._pending_values = []
+        self._n_observations = len(dist)
+        self._degree = degree
+        self._forgetting_factor = forgetting_factor
+        self._x_scale = max(len(dist) - 1, 1)
+        self._r_matrix = np.empty((0, degree + 1))
+        self._qty = np.empty(0)
         self._processed_dist = None
         self._lsm_coefficients = None
-        self._feature_matrix = None
+        self._fit_time = None
+        self._condition_number = None
         self._get_lsm_coefficients()
 
+    @staticmethod
+    def _normalize_indices(indices, x_scale):
+        """
+        Відображає індекси вимірів 0..x_scale на відрізок [-1, 1]
+        :param indices: індекси вимірів у вигляді np.array
+        :param x_scale: індекс останнього виміру вибірки, за якою визначено нормування
+        :return: нормовані індекси у вигляді np.array float64
+        """
+        return 2.0 * np.asarray(indices, dtype=np.float64) / x_scale - 1.0
+
+    def _get_basis(self, indices):
+        """
+        Формує матрицю ознак у базисі поліномів Чебишова від індексів, нормованих на відрізок [-1, 1]
+        за довжиною вихідної вибірки. На відміну від степенів i**k такий базис добре обумовлений
+        навіть для мільйонів вимірів
+        :param indices: індекси вимірів у вигляді np.array
+        :return: матриця ознак розміром (len(indices), degree + 1)
+        """
+        return chebvander(self._normalize_indices(indices, self._x_scale), self._degree)
+
     def _get_lsm_coefficients(self):
         """
-        Виконується при ініціалізації класу. Застосовує МНК до вибірки класу та збирає поліноміальні коефіцієнти
-        Має опцію застосування поліному 3 порядку за змінною self._third_polynomial_degree
+        Виконується при ініціалізації класу. Застосовує МНК до вибірки класу та збирає поліноміальні коефіцієнти.
+        Матриця ознак формується блоками, кожен блок додається до QR-розкладу (R, Q^T y) накопиченого
+        на попередніх блоках, тому в пам'яті ніколи не зберігається вся матриця ознак
+        """
+        start_time = time.perf_counter()
+
+        for start in range(0, self._n_observations, self._CHUNK_SIZE):
+            end = min(start + self._CHUNK_SIZE, self._n_observations)
+            indices = np.arange(start, end)
+            values = np.asarray(self._distribution[start:end], dtype=np.float64).ravel()
+
+            if self._forgetting_factor < 1:
+                weights = np.sqrt(self._forgetting_factor) ** (self._n_observations - 1 - indices)
+                self._add_rows(indices, values, weights)
+            else:
+                self._add_rows(indices, values)
+
+        self._solve_coefficients()
+        self._fit_time = time.perf_counter() - start_time
+
+    def _add_rows(self, indices, values, weights=None):
+        """
+        Додає рядки матриці ознак та відповідні значення вибірки до накопиченого QR-розкладу
+        :param indices: індекси вимірів у вигляді np.array
+        :param values: значення вимірів у вигляді np.array
+        :param weights: опціональні ваги рядків (квадратні корені ваг МНК)
+        """
+        basis = self._get_basis(indices)
+        if weights is not None:
+            basis = basis * weights[:, np.newaxis]
+            values = values * weights
+
+        q_matrix, self._r_matrix = np.linalg.qr(np.vstack((self._r_matrix, basis)))
+        self._qty = q_matrix.T.dot(np.concatenate((self._qty, values)))
+
+    def _solve_coefficients(self):
+        """
+        Розв'язує трикутну систему R c = Q^T y накопиченого розкладу та оновлює коефіцієнти поліному
+        """
+        coefficients = np.linalg.lstsq(self._r_matrix, self._qty, rcond=None)[0]
+        self._lsm_coefficients = coefficients.reshape(-1, 1)
+        self._condition_number = float(np.linalg.cond(self._r_matrix))
+
+    def update(self, new_values):
+        """
+        Додає нові виміри в кінець вибірки та оновлює поліноміальні коефіцієнти без повторного
+        припасування всієї вибірки. Оновлюється лише QR-розклад розміру (degree + 1), тому вартість
+        залежить від кількості нових вимірів, а не від довжини історії.
+        Коли вибірка зростає більш ніж у _RESCALE_FACTOR разів, нормування індексів оновлюється
+        (див. _rescale), щоб нові виміри не виходили далеко за межі [-1, 1] і матриця лишалась добре обумовленою.
+        Попередні результати lsm_fit / lsm_extrapolate скидаються
+        :param new_values: нові виміри (число або послідовність чисел)
+        """
+        values = np.asarray(new_values, dtype=np.float64).ravel()
+        if not len(values):
+            return
+
+        self._processed_dist = None
+        last_index = self._n_observations + len(values) - 1
+        if last_index > self._RESCALE_FACTOR * self._x_scale:
+            self._rescale(last_index)
+
+        indices = np.arange(self._n_observations, self._n_observations + len(values))
+
+        if self._forgetting_factor < 1:
+            decay = np.sqrt(self._forgetting_factor)
+            # Старіші виміри загасають на decay за кожен новий вимір
+            self._r_matrix = self._r_matrix * decay ** len(values)
+            self._qty = self._qty * decay ** len(values)
+            self._add_rows(indices, values, decay ** (indices[-1] - indices))
+        else:
+            self._add_rows(indices, values)
+
+        self._solve_coefficients()
+        self._pending_values.append(values)
+        self._n_observations += len(values)
+
+    def _rescale(self, x_scale):
+        """
+        Переводить накопичений QR-розклад у базис з новим нормуванням індексів без повторного проходу по вибірці.
+        Старий базис виражається через новий матрицею переходу T (старі ознаки = нові ознаки T), тож
+        рядки матриці ознак у новому базисі - це R T^-1, які повторно приводяться до трикутного вигляду
+        :param x_scale: нове нормування - індекс, що відображається на 1
         """
-        f_matrix_dimension = 4 if self._third_polynomial_degree else 3
-        y_matrix = np.zeros((len(self._distribution), 1))
-        f_matrix = np.ones((len(self._distribution), f_matrix_dimension))
+        # Вузли Чебишова дають добре обумовлену систему для матриці переходу
+        nodes = np.cos(np.pi * (np.arange(self._degree + 1) + 0.5) / (self._degree + 1))
+        new_basis = chebvander(nodes, self._degree)
+        old_basis = chebvander((nodes + 1) * x_scale / self._x_scale - 1, self._degree)
+        transition = np.linalg.solve(new_basis, old_basis)
 
-        for i in range(len(self._distribution)):
-            y_matrix[i, 0] = float(self._distribution[i])
-            f_matrix[i, 1] = float(i)
-            f_matrix[i, 2] = float(i * i)
-            if self._third_polynomial_degree:
-                f_matrix[i, 3] = float(i * i * i)
+        rows = np.linalg.solve(transition.T, self._r_matrix.T).T
+        q_matrix, self._r_matrix = np.linalg.qr(rows)
+        self._qty = q_matrix.T.dot(self._qty)
+        self._x_scale = x_scale
 
-        self._feature_matrix = f_matrix
-        f_matrix_transposed = f_matrix.T
-        feature_matrix = f_matrix_transposed.dot(f_matrix)
-        feature_matrix_inverted = np.linalg.inv(feature_matrix)
-        self._lsm_coefficients = feature_matrix_inverted.dot(f_matrix_transposed).dot(y_matrix)
+    def _get_distribution(self):
+        """
+        Повертає вибірку разом з вимірами доданими через update(). Нові виміри приєднуються лише
+        при зверненні, щоб update() не копіював всю історію на кожному кроці
+        :return: вибірка у вигляді np.array
+        """
+        if self._pending_values:
+            self._distribution = np.concatenate([np.asarray(self._distribution, dtype=np.float64).ravel()]
+                                                + self._pending_values)
+            self._pending_values = []
+        return self._distribution
+
+    def get_fit_report(self):
+        """
+        Повертає параметри виконаного припасування поліному
+        :return: словник зі степенем поліному, часом припасування в секундах та числом обумовленості матриці ознак
+        """
+        return {
+            'degree': self._degree,
+            'fit_time': self._fit_time,
+            'condition_number': self._condition_number,
+        }
 
-    def lsm_extrapolate(self, predict_range):
+    def _evaluate(self, indices):
+        """
+        Обчислює значення поліному в заданих індексах схемою Кленшоу (аналог схеми Горнера для
+        поліномів Чебишова) одразу над усім вектором індексів, без формування матриці ознак
+        :param indices: індекси вимірів у вигляді np.array
+        :return: значення поліному у вигляді np.array тієї ж форми що й indices
+        """
+        return chebval(self._normalize_indices(indices, self._x_scale), self._lsm_coefficients[:, 0])
+
+    def lsm_extrapolate(self, predict_range, out=None):
         """
         Виконує екстраполяцію на встановлений інтервал використовуючи поліноміальні коефіцієнти визначені за МНК
         :param predict_range: довжина інтервалу екстраполяції
+        :param out: опціональний буфер довжини n + predict_range (наприклад np.memmap з create_series)
+        для поблокового запису результату
         """
-        predicted_dist = np.zeros((len(self._distribution) + predict_range, 1))
-        c = self._lsm_coefficients
+        self._processed_dist = self._evaluate_range(self._n_observations + predict_range, out)
 
-        for i in range(len(self._distribution) + predict_range):
-            if self._third_polynomial_degree:
-                predicted_dist[i] = c[0] + c[1] * i + (c[2] * i * i + c[3] * i * i * i)
-            else:
-                predicted_dist[i] = c[0] + c[1] * i + (c[2] * i * i)
+    def lsm_fit(self, out=None):
+        """
+        Виконує згладжування вибірки використовуючи поліноміальні коефіцієнти визначені за МНК
+        :param out: опціональний буфер довжини вибірки (наприклад np.memmap з create_series)
+        для поблокового запису результату
+        """
+        self._processed_dist = self._evaluate_range(self._n_observations, out)
+
+    def _evaluate_range(self, length, out=None):
+        """
+        Обчислює поліном в індексах 0..length-1
+        :param length: кількість значень
+        :param out: опціональний буфер, що заповнюється блоками без проміжних масивів на всю довжину
+        :return: np.array розміром (length, 1) або переданий буфер
+        """
+        if out is None:
+            return self._evaluate(np.arange(length)).reshape(-1, 1)
 
-        self._processed_dist = predicted_dist
+        if len(out) != length:
+            raise Exception(f'Довжина буфера out має дорівнювати {length}')
+        flat_out = out.reshape(-1)
+        for start, chunk in iter_chunks(flat_out, self._CHUNK_SIZE):
+            chunk[:] = self._evaluate(np.arange(start, start + len(chunk)))
+        return out
 
-    def lsm_fit(self):
+    def forecast(self, horizons):
         """
-        Виконує згладжування вибірки використовуючи поліноміальні коефіцієнти визначені за МНК
+        Повертає прогноз на кілька горизонтів одним викликом
+        :param horizons: горизонт або послідовність горизонтів (1 - наступний вимір після вибірки)
+        :return: прогнозовані значення у вигляді np.array для кожного горизонту
+        """
+        horizons = np.asarray(horizons)
+        return self._evaluate(self._n_observations - 1 + horizons)
+
+    def get_metrics(self):
+        """
+        Оцінює точність згладженого чи екстрапольованого тренду на проміжку оригінальної вибірки
+        :return: RegressionMetrics з коефіцієнтом детермінації, MAE, RMSE та MAPE (у відсотках,
+        без урахування нульових вимірів)
         """
-        self._processed_dist = self._feature_matrix.dot(self._lsm_coefficients)
+        if self._processed_dist is None:
+            self.lsm_fit()
+
+        distribution = self._get_distribution()
+        processed = self._processed_dist.reshape(-1)
+
+        # Перший прохід - середнє, другий - суми відхилень; обидва поблокові, щоб не створювати
+        # проміжних масивів на всю довжину вибірки
+        mean_value = sum(float(np.sum(chunk, dtype=np.float64))
+                         for _, chunk in iter_chunks(distribution, self._CHUNK_SIZE)) / len(distribution)
+
+        sum_squared_residuals = 0.0
+        total_sum_squares = 0.0
+        sum_absolute_residuals = 0.0
+        sum_absolute_percentage = 0.0
+        non_zero_count = 0
+        for start, chunk in iter_chunks(distribution, self._CHUNK_SIZE):
+            values = np.asarray(chunk, dtype=np.float64).ravel()
+            residuals = values - processed[start:start + len(values)]
+            centered = values - mean_value
+
+            sum_squared_residuals += np.dot(residuals, residuals)
+            total_sum_squares += np.dot(centered, centered)
+            sum_absolute_residuals += np.sum(np.abs(residuals))
+
+            non_zero = values != 0
+            sum_absolute_percentage += np.sum(np.abs(residuals[non_zero] / values[non_zero]))
+            non_zero_count += np.count_nonzero(non_zero)
+
+        return RegressionMetrics(
+            r2=float(1 - sum_squared_residuals / total_sum_squares),
+            mae=float(sum_absolute_residuals / len(distribution)),
+            rmse=float(np.sqrt(sum_squared_residuals / len(distribution))),
+            mape=float(sum_absolute_percentage / non_zero_count * 100) if non_zero_count else np.nan,
+        )
 
     def r2_score(self):
         """
         Оцінює детермінацію прогнозованих даних відносно оригінальної вибірки
         :return: коефіцієнт детермінації у числовому вигляді
         """
-        numerator = 0
-        denominator_1 = 0
-        for i in range(len(self._processed_dist)):
-            numerator += (self._distribution[i] - self._processed_dist[i]) ** 2
-            denominator_1 = denominator_1 + self._distribution[i]
-        denominator_2 = 0
-        for i in range(len(self._processed_dist)):
-            denominator_2 = denominator_2 + (self._distribution[i] - (denominator_1 / len(self._processed_dist))) ** 2
-        r2_score = 1 - (numerator / denominator_2)
+        r2_score = self.get_metrics().r2
         print('Коефіцієнт детермінації (ймовірність апроксимації)=', r2_score)
 
         return r2_score
 
+    @staticmethod
+    def fit_many(matrix_2d, degree=2, predict_range=0):
+        """
+        Застосовує МНК одночасно до всіх стовпців матриці. Усі стовпці мають спільну сітку індексів,
+        тож матриця ознак розкладається (QR) лише один раз, а коефіцієнти для всіх рядів отримуються
+        одним матричним множенням замість окремого об'єкту Predictive на кожен ряд
+        :param matrix_2d: np.array розміром (кількість вимірів, кількість рядів)
+        :param degree: степінь поліному
+        :param predict_range: довжина інтервалу екстраполяції
+        :return: BatchFit з коефіцієнтами (degree + 1, кількість рядів) у тому ж базисі Чебишова що й у Predictive,
+        прогнозами розміром (predict_range, кількість рядів) та вектором коефіцієнтів детермінації
+        """
+        values = np.asarray(matrix_2d, dtype=np.float64)
+        if values.ndim == 1:
+            values = values.reshape(-1, 1)
+
+        x_scale = max(values.shape[0] - 1, 1)
+        indices = np.arange(values.shape[0])
+        basis = chebvander(Predictive._normalize_indices(indices, x_scale), degree)
+
+        q_matrix, r_matrix = np.linalg.qr(basis)
+        coefficients = np.linalg.lstsq(r_matrix, q_matrix.T.dot(values), rcond=None)[0]
+
+        residuals = values - basis.dot(coefficients)
+        centered = values - values.mean(axis=0)
+        r2 = 1 - np.einsum('ij,ij->j', residuals, residuals) / np.einsum('ij,ij->j', centered, centered)
+
+        future_indices = np.arange(values.shape[0], values.shape[0] + predict_range)
+        forecasts = chebvander(Predictive._normalize_indices(future_indices, x_scale), degree).dot(coefficients)
+
+        return BatchFit(coefficients=coefficients, forecasts=forecasts, r2=r2)
+
     def show_plot(self, original_trend=None):
         """
         Демонструє графік вибірки та накладену на нього лінію згладженого чи екстрапольованого тренду
         Опціонально приймає вибірку оригінального тренду для порівняння
         :param original_trend: оригінальний тренд у вигляді np.array
         """
+        distribution = self._get_distribution()
         x = np.linspace(0, self._processed_dist.shape[0], self._processed_dist.shape[0])
-        additional_range = self._processed_dist.shape[0] - self._distribution.shape[0]
-        original_dist = np.append(self._distribution, np.full(additional_range, np.nan))
+        additional_range = self._processed_dist.shape[0] - distribution.shape[0]
+        original_dist = np.append(distribution, np.full(additional_range, np.nan))
 
         plt.clf()
         if original_trend is not None:
@@ -1,109 +1,160 @@
 import numpy as np
 import matplotlib.pyplot as plt
 
+from models.filter_kernels import STATE_FIELDS, initial_state, run_filter
+from tools.series_io import iter_chunks
+
+
+class FilterState:
+    """
+    Компактний стан рекурентного фільтру: позиція, швидкість, прискорення, кількість оброблених вимірів
+    та поточні коефіцієнти. Для багатоканальної фільтрації кожне поле - вектор значень по каналах
+    """
+    def __init__(self, filter_type, state_array):
+        """
+        Ініціалізує клас
+        :param filter_type: тип фільтру, до якого належить стан
+        :param state_array: np.array розміром (7,) або (7, кількість каналів) з полями у порядку STATE_FIELDS
+        """
+        self.filter_type = filter_type
+        self._state_array = np.array(state_array, dtype=np.float64)
+
+    def __getattr__(self, name):
+        if name in STATE_FIELDS:
+            value = self._state_array[STATE_FIELDS.index(name)]
+            return int(value.flat[0]) if name == 'n' else value
+        raise AttributeError(name)
+
+    def to_dict(self):
+        """
+        Перетворює стан у словник з простих типів Python (наприклад для збереження у JSON)
+        :return: словник з типом фільтру та полями стану
+        """
+        state_dict = {'filter_type': self.filter_type}
+        for field, value in zip(STATE_FIELDS, self._state_array):
+            state_dict[field] = value.tolist()
+        state_dict['n'] = self.n
+        return state_dict
+
+    @classmethod
+    def from_dict(cls, state_dict):
+        """
+        Відновлює стан зі словника, отриманого з to_dict()
+        :param state_dict: словник з типом фільтру та полями стану
+        :return: об'єкт FilterState
+        """
+        values = [state_dict[field] for field in STATE_FIELDS]
+        if np.ndim(values[0]) == 1:
+            values[STATE_FIELDS.index('n')] = [state_dict['n']] * len(values[0])
+        return cls(state_dict['filter_type'], np.array(values, dtype=np.float64))
+
+    def get_array(self):
+        """
+        :return: копія масиву стану у форматі ядер фільтру
+        """
+        return self._state_array.copy()
+
 
 class RecurrentFilter:
     """
     Виконує екстраполяцію на основі методу рекурентної фільтрації
     """
-    def __init__(self, filter_type):
+    def __init__(self, filter_type, use_jit=None):
         """
         Ініціалізує клас
         :param filter_type: тип виокристованого фільтру
+        :param use_jit: True/False для примусового вибору скомпільованого (Numba) чи Python ядра фільтру,
+        None - скомпільоване ядро обирається автоматично, якщо Numba встановлено
         """
         self._is_alpha_beta = 'alpha-beta' == filter_type.lower()
         self._is_alpha_beta_gamma = 'alpha-beta-gamma' == filter_type.lower()
         self._original_dist = None
         self._processed_dist = None
+        self._use_jit = use_jit
+        self._filter_type = 'alpha-beta' if self._is_alpha_beta else 'alpha-beta-gamma'
+        self._state = None
 
-    def process(self, dist):
+    def process(self, dist, out=None):
         """
-        Запускає ітерацію фільтру за кожним значенням переданої вибірки і збирає екстрапольовані результати
-        :param dist: тренд змінюваного процесу в форматі np.array
+        Запускає ітерацію фільтру за кожним значенням переданої вибірки і збирає екстрапольовані результати.
+        Фільтр починає роботу з нуля, а його стан після обробки доступний через get_state() та step()
+        :param dist: тренд змінюваного процесу в форматі np.array, або двовимірний np.array (час, канали)
+        для одночасної фільтрації кількох каналів з окремими коефіцієнтами для кожного
+        :param out: опціональний буфер форми dist (наприклад np.memmap з create_series). Вибірка тоді
+        фільтрується блоками з передачею стану між ними, тож у пам'яті не створюються масиви на всю довжину
         """
         self._original_dist = dist
+        self._state = None
 
-        if self._is_alpha_beta:
+        if out is not None:
+            self._process_chunked(dist, out)
+        elif self._is_alpha_beta:
             self._alpha_beta_filter()
         elif self._is_alpha_beta_gamma:
             self._alpha_beta_gamma_filter()
 
-    def _alpha_beta_filter(self):
+    def _process_chunked(self, dist, out):
         """
-        Реалізація альфа-бета фільтру
+        Фільтрує вибірку блоками, записуючи результат у переданий буфер
+        :param dist: вибірка (np.array чи np.memmap)
+        :param out: буфер результатів тієї ж довжини
         """
-        Yin = np.zeros((len(self._original_dist), 1))
-        YoutAB = np.zeros((len(self._original_dist), 1))
-        T0 = 1
-        for i in range(len(self._original_dist)):
-            Yin[i, 0] = float(self._original_dist[i])
-
-        Yspeed_retro = (Yin[1, 0] - Yin[0, 0]) / T0
-        Yextra = Yin[0, 0] + Yspeed_retro
-        alpha = self._update_alpha(1)
-        beta = self._update_beta(1)
-        YoutAB[0, 0] = Yin[0, 0] + alpha * (Yin[0, 0])
+        if len(out) != len(dist):
+            raise Exception('Довжина буфера out має дорівнювати довжині вибірки')
 
-        for i in range(1, len(self._original_dist)):
-            error = Yin[i, 0] - Yextra
+        for start, chunk in iter_chunks(dist):
+            filtered, _, self._state = run_filter(self._filter_type, chunk, self._state, self._use_jit)
+            out[start:start + len(chunk)] = filtered.reshape(out[start:start + len(chunk)].shape)
+        self._processed_dist = out
 
-            YoutAB[i, 0] = Yextra + alpha * error
-            Yspeed = Yspeed_retro + (beta / T0) * error
-            Yspeed_retro = Yspeed
-            Yextra = YoutAB[i, 0] + Yspeed_retro
-            alpha = self._update_alpha(i)
-            beta = self._update_beta(i)
-
-        self._processed_dist = YoutAB
+    def _alpha_beta_filter(self):
+        """
+        Реалізація альфа-бета фільтру
+        """
+        YoutAB, _, self._state = run_filter('alpha-beta', self._original_dist, use_jit=self._use_jit)
+        self._processed_dist = YoutAB if YoutAB.ndim == 2 else YoutAB.reshape(-1, 1)
 
     def _alpha_beta_gamma_filter(self):
         """
         Реалізація альфа-бета-гамма фільтру що адаптується на основі точністі кожного передбачення
         """
-        Yin = np.zeros((len(self._original_dist), 1))
-        YoutABG = np.zeros((len(self._original_dist), 1))
-        T0 = 1
-        for i in range(len(self._original_dist)):
-            Yin[i, 0] = float(self._original_dist[i])
-
-        Yspeed_retro = (Yin[1, 0] - Yin[0, 0]) / T0
-        Yaccel_retro = 0  # Початкове прискорення
-        Yextra = Yin[0, 0] + Yspeed_retro
-
-        base_alpha = self._update_alpha(1)
-        beta = self._update_beta(1)
-        gamma = 0.001
-
-        YoutABG[0, 0] = Yin[0, 0] + base_alpha * (Yin[0, 0])
-
-        for i in range(1, len(self._original_dist)):
-            error = Yin[i, 0] - Yextra
-
-            # Проста адаптація параметрів на основі помилки
-            accuracy_penalty = 1.0 / (1.0 + abs(error))
+        YoutABG, _, self._state = run_filter('alpha-beta-gamma', self._original_dist, use_jit=self._use_jit)
+        self._processed_dist = YoutABG if YoutABG.ndim == 2 else YoutABG.reshape(-1, 1)
 
-            alpha = base_alpha * accuracy_penalty
-            beta = beta * accuracy_penalty
-            gamma = gamma * accuracy_penalty
-
-            YoutABG[i, 0] = Yextra + alpha * error
-            Yspeed = Yspeed_retro + (beta / T0) * error
-            Yaccel = Yaccel_retro + (gamma / T0) * error
-
-            Yspeed_retro = Yspeed
-            Yaccel_retro = Yaccel
-
-            Yextra = YoutABG[i, 0] + Yspeed + 0.5 * Yaccel * T0
-
-        self._processed_dist = YoutABG
+    def step(self, batch):
+        """
+        Обробляє нову порцію вимірів, продовжуючи з поточного стану фільтру без повторної обробки історії.
+        Порція може містити навіть один вимір
+        :param batch: нові виміри: число, одновимірний np.array чи двовимірний (час, канали)
+        :return: кортеж (відфільтровані значення, екстрапольовані на наступний вимір значення) тієї ж форми
+        що й порція. Для першого виміру екстраполяція невизначена (nan)
+        """
+        values = np.asarray(batch, dtype=np.float64)
+        if values.ndim == 0:
+            values = values.reshape(1)
+        filtered, extrapolated, self._state = run_filter(self._filter_type, values, self._state, self._use_jit)
+        return filtered, extrapolated
 
-    @staticmethod
-    def _update_alpha(n):
-        return (2 * (2 * n - 1)) / (n * (n + 1))
+    def get_state(self):
+        """
+        Повертає копію поточного стану фільтру, яку можна серіалізувати (FilterState.to_dict)
+        та відновити після перезапуску через set_state()
+        :return: об'єкт FilterState
+        """
+        if self._state is None:
+            return FilterState(self._filter_type, initial_state())
+        return FilterState(self._filter_type, self._state)
 
-    @staticmethod
-    def _update_beta(n):
-        return 6 / (n * (n + 1))
+    def set_state(self, state):
+        """
+        Відновлює стан фільтру, після чого step() продовжує обробку з нього
+        :param state: об'єкт FilterState або словник з FilterState.to_dict()
+        """
+        if isinstance(state, dict):
+            state = FilterState.from_dict(state)
+        if state.filter_type != self._filter_type:
+            raise Exception(f'Стан належить фільтру {state.filter_type}, а не {self._filter_type}')
+        self._state = state.get_array()
 
     def get_processed_dist(self):
         """
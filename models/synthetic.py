@@ -0,0 +1,128 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from models.distribution import Distribution
+from models.trend import Trend
+from tools.series_io import DEFAULT_CHUNK_SIZE
+
+
+SyntheticBatch = namedtuple('SyntheticBatch', ['series', 'labels'])
+
+
+class SyntheticGenerator:
+    """
+    Генерує набори синтетичних вибірок (тренд + похибка + аномалії) з розміткою аномалій для тестування
+    та бенчмарків. Дані формуються блоками фіксованого розміру, кожен блок має власний незалежний потік
+    np.random.Generator, породжений від спільного SeedSequence. Тому результат відтворюється за seed
+    і не залежить від того, послідовно чи паралельно генеруються блоки
+    """
+    def __init__(self, seed=None, trend_type='Constant', dist_type='Normal', min_val=0, max_val=1,
+                 anomaly_rate=0.001, anomaly_scale=1.5, chunk_size=DEFAULT_CHUNK_SIZE,
+                 trend_params=None, dist_params=None):
+        """
+        Ініціалізує клас
+        :param seed: ціле число, np.random.SeedSequence або None (випадковий seed)
+        :param trend_type: тип тренду як у Trend ('Linear', 'Quadratic', 'Constant')
+        :param dist_type: закон розподілу похибки як у Distribution ('Normal', 'Uniform', 'Exponential')
+        :param min_val: значення x на початку кожної вибірки
+        :param max_val: значення x в кінці кожної вибірки
+        :param anomaly_rate: частка аномальних вимірів
+        :param anomaly_scale: множник значення аномального виміру (як в AnomalyGenerator)
+        :param chunk_size: кількість вимірів у блоці генерації; відтворюваність гарантується при однаковому значенні
+        :param trend_params: параметри тренду (наприклад {'slope': 1, 'intercept': 0})
+        :param dist_params: параметри розподілу похибки (наприклад {'mu': 0, 'sigma': 1})
+        """
+        self._seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self._trend_function = Trend(trend_type)._get_trend_function(**(trend_params or {'c': 0}))
+        self._dist_type = dist_type
+        self._dist_params = dist_params or {'mu': 0, 'sigma': 1}
+        self._min_val = min_val
+        self._max_val = max_val
+        self._chunk_size = chunk_size
+
+        if not 0 <= anomaly_rate <= 1:
+            raise Exception('Частка аномалій має бути в межах від 0 до 1')
+        self._anomaly_rate = anomaly_rate
+        self._anomaly_scale = anomaly_scale
+
+        # Перевіряємо параметри розподілу до початку генерації
+        Distribution(dist_type, rng=0)._get_distribution_functions(**self._dist_params)
+
+    def get_entropy(self):
+        """
+        :return: entropy кореневого SeedSequence, за яким можна відтворити всі згенеровані дані
+        """
+        return self._seed_sequence.entropy
+
+    def generate(self, n_series, length, out=None, labels_out=None, workers=1):
+        """
+        Генерує n_series вибірок довжини length за один виклик. Кожен виклик отримує новий дочірній
+        SeedSequence, тож послідовність викликів з однаковим seed відтворює ті самі дані
+        :param n_series: кількість вибірок
+        :param length: довжина кожної вибірки
+        :param out: опціональний суцільний буфер (n_series, length), наприклад np.memmap
+        :param labels_out: опціональний буфер bool (n_series, length) для розмітки аномалій
+        :param workers: кількість потоків; генератори NumPy звільняють GIL, тож блоки генеруються паралельно
+        :return: SyntheticBatch (вибірки (n_series, length), bool розмітка аномалій того ж розміру)
+        """
+        if out is None:
+            out = np.empty((n_series, length))
+        if labels_out is None:
+            labels_out = np.empty((n_series, length), dtype=bool)
+        if out.shape != (n_series, length) or labels_out.shape != (n_series, length):
+            raise Exception('Розмір буферів out та labels_out має дорівнювати (n_series, length)')
+
+        values = out.reshape(-1)
+        labels = labels_out.reshape(-1)
+        starts = range(0, n_series * length, self._chunk_size)
+        streams = self._seed_sequence.spawn(1)[0].spawn(len(starts))
+
+        def fill(task):
+            start, stream = task
+            end = min(start + self._chunk_size, len(values))
+            self._fill_chunk(values[start:end], labels[start:end], start, length, np.random.default_rng(stream))
+
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(fill, zip(starts, streams)))
+        else:
+            for task in zip(starts, streams):
+                fill(task)
+
+        return SyntheticBatch(out, labels_out)
+
+    def iter_batches(self, n_series, length, batch_series):
+        """
+        Генерує великий набір частинами по batch_series вибірок, щоб не тримати його в пам'яті повністю.
+        Кожна частина має власний незалежний потік, породжений від кореневого SeedSequence
+        :param n_series: загальна кількість вибірок
+        :param length: довжина кожної вибірки
+        :param batch_series: кількість вибірок у частині
+        :return: генератор кортежів (індекс першої вибірки частини, SyntheticBatch)
+        """
+        for start in range(0, n_series, batch_series):
+            yield start, self.generate(min(batch_series, n_series - start), length)
+
+    def _fill_chunk(self, values, labels, start, length, rng):
+        """
+        Заповнює блок вимірів у плоскому поданні набору (вибірки розташовані одна за одною)
+        :param values: блок буфера значень
+        :param labels: блок буфера розмітки
+        :param start: плоский індекс першого виміру блоку
+        :param length: довжина кожної вибірки
+        :param rng: np.random.Generator блоку
+        """
+        positions = np.arange(start, start + len(values)) % length
+        step = (self._max_val - self._min_val) / (length - 1) if length > 1 else 0.0
+        sampler, _ = Distribution(self._dist_type, rng=rng)._get_distribution_functions(**self._dist_params)
+
+        values[:] = self._trend_function(self._min_val + step * positions)
+        values += sampler(len(values))
+
+        labels[:] = False
+        anomalies_number = rng.binomial(len(values), self._anomaly_rate)
+        anomaly_indices = rng.choice(len(values), anomalies_number, replace=False)
+        values[anomaly_indices] *= self._anomaly_scale
+        labels[anomaly_indices] = True
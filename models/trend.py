@@ -1,6 +1,8 @@
 import numpy as np
 import matplotlib.pyplot as plt
 
+from tools.series_io import iter_chunks
+
 
 class Trend:
 
@@ -15,20 +17,44 @@ class Trend:
         self._is_constant = 'constant' in trend_type.lower()
         self._distribution = None
         self._linear_space = None
+        self._linear_space_bounds = None
 
         if True not in [self._is_quadratic, self._is_linear, self._is_constant]:
             raise Exception("Допустимі значення тренду: 'Linear', 'Quadratic' та 'Constant'")
 
-    def create_trend(self, min_val, max_val, size, **kwargs):
+    def create_trend(self, min_val, max_val, size, out=None, **kwargs):
         """
         Створює вибірку за визначеним трендом та параметрами, передає дані для побудови графіку
         :param min_val: мінімальне значення вибірки
         :param max_val: максимальне значення вибірки
         :param size: об'єм вибірки
+        :param out: опціональний буфер довжини size (наприклад np.memmap з create_series), у який тренд
+        записується блоками без створення проміжних масивів на всю довжину
         :param kwargs: спеціальні параметри для обраного типу тренду
         """
-        self._linear_space = np.linspace(min_val, max_val, size)
+        trend_function = self._get_trend_function(**kwargs)
+        self._linear_space_bounds = (min_val, max_val)
+
+        if out is None:
+            self._linear_space = np.linspace(min_val, max_val, size)
+            self._distribution = trend_function(self._linear_space)
+            return
+
+        if len(out) != size:
+            raise Exception('Довжина буфера out має дорівнювати розміру вибірки')
+
+        step = (max_val - min_val) / (size - 1) if size > 1 else 0.0
+        for start, chunk in iter_chunks(out):
+            chunk[:] = trend_function(min_val + step * np.arange(start, start + len(chunk)))
+        self._linear_space = None
+        self._distribution = out
 
+    def _get_trend_function(self, **kwargs):
+        """
+        Перевіряє параметри обраного типу тренду
+        :param kwargs: спеціальні параметри для обраного типу тренду
+        :return: функція, що обчислює значення тренду для масиву значень x
+        """
         if self._is_linear:
             try:
                 slope = kwargs['slope']
@@ -36,7 +62,7 @@ class Trend:
             except Exception:
                 raise Exception("Переконайтесь що в метод передано значення градієнту 'slope' та перетину 'intercept'")
 
-            self._distribution = slope * self._linear_space + intercept
+            return lambda linear_space: slope * linear_space + intercept
 
         elif self._is_quadratic:
             try:
@@ -46,7 +72,7 @@ class Trend:
             except Exception:
                 raise Exception("Переконайтесь що в метод передано коефіцієнти 'a', 'b' та константу 'c'")
 
-            self._distribution = a * self._linear_space**2 + b * self._linear_space + c
+            return lambda linear_space: a * linear_space**2 + b * linear_space + c
 
         elif self._is_constant:
             try:
@@ -54,12 +80,14 @@ class Trend:
             except Exception:
                 raise Exception("Переконайтесь що в метод передано константу 'c'")
 
-            self._distribution = np.full(size, c)
+            return lambda linear_space: np.full(len(linear_space), c)
 
     def show_plot(self):
         """
         Відображує графік зміни досліджуваного процесу (тренд)
         """
+        if self._linear_space is None:
+            self._linear_space = np.linspace(*self._linear_space_bounds, len(self._distribution))
         trend_name = 'Лінійний' if self._is_linear else 'Постійний' if self._is_constant else 'Квадратичний'
         plt.plot(self._linear_space, self._distribution, label=f'{trend_name} тренд')
         plt.xlabel('$x$')
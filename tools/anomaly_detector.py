@@ -1,7 +1,19 @@
+from collections import namedtuple
+
 import numpy as np
 from scipy.signal import find_peaks
 from scipy.stats import norm
 
+from tools.rolling_stats import RollingStatistics
+from tools.series_io import DEFAULT_CHUNK_SIZE, iter_chunks
+from tools.series_patch import SeriesPatch
+
+
+# Якщо раунд кастомного методу звільнив меншу частку піків, що очікують, решта обробляється послідовно
+_MIN_ROUND_FRACTION = 0.125
+
+DetectionScore = namedtuple('DetectionScore', ['precision', 'recall', 'f1', 'true_positives', 'found', 'actual'])
+
 
 class AnomalyDetector:
     """
@@ -16,75 +28,360 @@ class AnomalyDetector:
         self._is_custom_method = 'custom' in method.lower()
         self._is_sliding_wind_method = 'sliding_wind' in method.lower()
         self._cleaned_dist = None
+        self._source_dist = None
+        self._anomaly_patch = None
         self._found_anomaly_indices = None
+        self._stream_wind_size = None
+        self._stream_threshold = None
+        self._stream_buffer = None
+        self._stream_buffer_fill = 0
+        self._stream_position = 0
 
-    def detect_and_clean(self, dist, wind_size, threshold):
+    def detect_and_clean(self, dist, wind_size, threshold, inplace=False, out=None):
         """
         Застосовує обраний метод детекції та корегує аномальні виміри, збирає дані про індекси аномалій
-        для подальшої валідації
+        для подальшої валідації. За замовчуванням вхідна вибірка не змінюється: для методу ковзного вікна
+        очищена вибірка створюється лише при виклику get_distribution(), а самі зміни повертаються
+        у вигляді розрідженої латки
         :param dist: вибірка з аномалними значеннями як np.array
         :param wind_size: розмір вікна застосованого для порівняльних операцій по виявленню АВ
         :param threshold: калібраційний параметр для формул розрахунку довірчого інтервалу
+        :param inplace: True - корегувати dist на місці
+        :param out: буфер довжини вибірки, у який записується очищена вибірка (несумісний з inplace)
+        :return: SeriesPatch з індексами скоригованих вимірів, їх оригінальними та новими значеннями
         """
+        if inplace and out is not None:
+            raise Exception('Параметри inplace та out не можна використовувати одночасно')
+        if out is not None and len(out) != len(dist):
+            raise Exception('Довжина буфера out має дорівнювати довжині вибірки')
 
-        if self._is_sliding_wind_method:
-            moving_avg = np.convolve(dist, np.ones(wind_size) / wind_size, mode='valid')
+        self._source_dist = None
+        self._cleaned_dist = None
 
-            standard_deviations = np.empty(len(dist) - wind_size + 1)
-            for i in range(len(standard_deviations)):
-                standard_deviations[i] = np.std(dist[i:i + wind_size])
+        if self._is_sliding_wind_method:
+            rolling_stats = RollingStatistics(dist, wind_size)
+            moving_avg = rolling_stats.get_mean()
+            standard_deviations = rolling_stats.get_std()
 
             anomalies = np.abs(dist[wind_size - 1:] - moving_avg) > threshold * standard_deviations
             self._found_anomaly_indices = np.flatnonzero(anomalies) + (wind_size - 1)
 
-            dist[self._found_anomaly_indices] = moving_avg[anomalies]
-            self._cleaned_dist = dist
+            self._anomaly_patch = SeriesPatch(self._found_anomaly_indices, dist[self._found_anomaly_indices],
+                                              moving_avg[anomalies])
+            if inplace:
+                self._cleaned_dist = self._anomaly_patch.apply(dist)
+            elif out is not None:
+                out[:] = dist
+                self._cleaned_dist = self._anomaly_patch.apply(out)
+            else:
+                self._source_dist = dist
 
         if self._is_custom_method:
-            peaks, _ = find_peaks(dist)  # Визначаємо піки (максимальні значення) у вибірці
-            sorted_peak_indices = np.argsort(dist[peaks])[::-1]  # Сортуємо індекси піків у порядку спадання їх значень
+            # Корекції методу накопичуються (вікна наступних піків бачать уже скориговані значення),
+            # тому йому потрібен робочий буфер
+            if inplace:
+                working = dist
+            elif out is not None:
+                out[:] = dist
+                working = out
+            else:
+                working = np.array(dist, dtype=np.result_type(dist, np.float64))
+
+            self._found_anomaly_indices, self._anomaly_patch = self._custom_detect_and_clean(working, wind_size,
+                                                                                             threshold)
+            self._cleaned_dist = working
+
+        return self._anomaly_patch
+
+    @staticmethod
+    def _custom_detect_and_clean(dist, wind_size, threshold):
+        """
+        Кастомний метод: усереднює вікно навколо кожного піку, якщо середнє вікна (без самого піку)
+        потрапляє в довірчий інтервал середнього всієї вибірки. Піки обробляються у порядку спадання значень.
+        Замість послідовного циклу піки розбиваються на раунди: у раунд потрапляють піки, вікна яких
+        не перетинаються з вікнами ще не оброблених піків, що йдуть раніше за порядком. Такі піки незалежні,
+        тому середні їх вікон рахуються разом через префіксні суми, а корекція застосовується однією операцією.
+        Результат збігається з послідовною обробкою піків один за одним.
+        Якщо раунд звільняє менше _MIN_ROUND_FRACTION піків, що очікують (наприклад, висоти сусідніх піків
+        монотонно спадають і кожен раунд звільняє один пік), решта піків обробляється послідовним циклом,
+        тож найгірший випадок не повільніший за цикл
+        :param dist: вибірка як np.array, коригується на місці
+        :param wind_size: кількість індексів до та після піку що входять у вікно
+        :param threshold: довірчий рівень для розрахунку довірчого інтервалу
+        :return: кортеж (список позицій у вибірці піків, що були скориговані, у порядку обробки;
+        SeriesPatch зі значеннями скоригованих вимірів до першої та після останньої корекції)
+        """
+        peaks, _ = find_peaks(dist)  # Визначаємо піки (максимальні значення) у вибірці
+        sorted_peak_indices = np.argsort(dist[peaks])[::-1]  # Сортуємо індекси піків у порядку спадання їх значень
+
+        mean_all = np.mean(dist)  # Обчислюємо середнє значення всієї вибірки
+        std_error_all = np.std(dist) / np.sqrt(len(dist))  # Обчислюємо стандартну похибку середнього для всієї вибірки
+        standard_score = norm.ppf(1 - (1 - threshold) / 2)  # Визначаємо z-значення для обраного довірчого рівня
+        confidence_interval = mean_all + np.array([-1, 1]) * standard_score * std_error_all  # Обчислюємо довірчий інтервал на основі середнього значення
+
+        # Порядковий номер обробки кожного піку (піки у масиві peaks впорядковані за позицією)
+        processing_rank = np.empty(len(peaks), dtype=np.int64)
+        processing_rank[sorted_peak_indices] = np.arange(len(peaks))
 
-            mean_all = np.mean(dist)  # Обчислюємо середнє значення всієї вибірки
-            std_error_all = np.std(dist) / np.sqrt(len(dist))  # Обчислюємо стандартну похибку середнього для всієї вибірки
-            standard_score = norm.ppf(1 - (1 - threshold) / 2)  # Визначаємо z-значення для обраного довірчого рівня
-            confidence_interval = mean_all + np.array([-1, 1]) * standard_score * std_error_all  # Обчислюємо довірчий інтервал на основі середнього значення
+        pending = np.arange(len(peaks))  # Індекси ще не оброблених піків, впорядковані за позицією
+        accepted_ranks = []
+        touched_indices = []
+        touched_values = []
 
-            anomaly_indices = []
+        while len(pending):
+            pending_positions = peaks[pending]
+            pending_ranks = processing_rank[pending]
 
-            for idx in sorted_peak_indices:  # Проходимо по відсортованих індексах піків
-                peak = peaks[idx]  # Отримуємо індекс поточного піка
-                window_start = max(0, peak - wind_size)  # Визначаємо початок вікна, забезпечуючи його обмеження від нуля
-                window_end = min(len(dist), peak + wind_size + 1)  # Визначаємо кінець вікна, обмежуючи його довжиною вибірки
+            # Пік блокується, якщо поруч (вікна перетинаються) є необроблений пік з меншим порядковим номером
+            blocked = np.zeros(len(pending), dtype=bool)
+            offset = 1
+            while offset < len(pending):
+                gaps = pending_positions[offset:] - pending_positions[:-offset]
+                overlapping = gaps <= 2 * wind_size
+                if not overlapping.any():
+                    break
+                left_ranks = pending_ranks[:-offset]
+                right_ranks = pending_ranks[offset:]
+                blocked[offset:] |= overlapping & (left_ranks < right_ranks)
+                blocked[:-offset] |= overlapping & (right_ranks < left_ranks)
+                offset += 1
 
-                # Формуємо дані для вікна, виключаючи сам пік
-                window_data = np.concatenate((dist[window_start:peak], dist[peak + 1:window_end]))
-                mean_window = np.mean(window_data)  # Обчислюємо середнє значення у вікні
+            ready = pending[~blocked]
+            if len(ready) < _MIN_ROUND_FRACTION * len(pending):
+                # Оброблені піки не перетинаються з жодним попереднім за порядком з тих, що очікують,
+                # тож решту можна обробити по порядку
+                ranks, indices, values = AnomalyDetector._sequential_detect_and_clean(
+                    dist, peaks[pending[np.argsort(pending_ranks)]], np.sort(pending_ranks),
+                    wind_size, confidence_interval)
+                accepted_ranks.append(ranks)
+                touched_indices.append(indices)
+                touched_values.append(values)
+                break
+            pending = pending[blocked]
 
-                # Перевіряємо, чи середнє значення вікна потрапляє в довірчий інтервал
-                if confidence_interval[0] <= mean_window <= confidence_interval[1]:
-                    correction_value = mean_window  # Якщо так, визначаємо значення для корекції
-                    anomaly_indices.append(idx)
+            ready_peaks = peaks[ready]
+            window_starts = np.maximum(0, ready_peaks - wind_size)  # Початки вікон, обмежені нулем
+            window_ends = np.minimum(len(dist), ready_peaks + wind_size + 1)  # Кінці вікон, обмежені довжиною вибірки
 
-                    # Проходимо по всіх індексах у вікні та коригуємо значення
-                    for j in range(window_start, window_end):
-                        dist[j] = (dist[j] + correction_value) / 2  # Замінюємо значення вікна на середнє між поточним та коригувальним значенням
+            # Вікна піків одного раунду не перетинаються, тож збираємо їх значення в один масив
+            lengths = window_ends - window_starts
+            window_offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+            window_indices = np.repeat(window_starts, lengths) + window_offsets
 
-            self._found_anomaly_indices = anomaly_indices
-            self._cleaned_dist = dist
+            # Середнє вікна без піку: сума вікна з префіксних сум мінус значення самого піку
+            prefix_sums = np.concatenate(([0.0], np.cumsum(dist[window_indices], dtype=np.float64)))
+            window_bounds = np.cumsum(lengths)
+            window_sums = prefix_sums[window_bounds] - prefix_sums[window_bounds - lengths] - dist[ready_peaks]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                mean_windows = window_sums / (lengths - 1)
+
+            # Перевіряємо, чи середнє значення вікна потрапляє в довірчий інтервал
+            is_accepted = (confidence_interval[0] <= mean_windows) & (mean_windows <= confidence_interval[1])
+            if not is_accepted.any():
+                continue
+            accepted_ranks.append(processing_rank[ready[is_accepted]])
+
+            # Замінюємо значення прийнятих вікон на середнє між поточним та коригувальним значенням
+            is_corrected = np.repeat(is_accepted, lengths)
+            corrected_indices = window_indices[is_corrected]
+            correction_values = np.repeat(mean_windows, lengths)[is_corrected]
+            touched_indices.append(corrected_indices)
+            touched_values.append(dist[corrected_indices])
+            dist[corrected_indices] = (dist[corrected_indices] + correction_values) / 2
+
+        accepted_ranks = [ranks for ranks in accepted_ranks if len(ranks)]
+        if not accepted_ranks:
+            return [], SeriesPatch(np.empty(0, dtype=np.int64), dist[:0], dist[:0])
+
+        # Вимір може потрапити у вікна кількох раундів: оригінальним є значення перед першою корекцією
+        touched_indices = np.concatenate(touched_indices)
+        patch_indices, first_touch = np.unique(touched_indices, return_index=True)
+        patch = SeriesPatch(patch_indices, np.concatenate(touched_values)[first_touch], dist[patch_indices])
+
+        return peaks[sorted_peak_indices[np.sort(np.concatenate(accepted_ranks))]].tolist(), patch
+
+    @staticmethod
+    def _sequential_detect_and_clean(dist, peak_positions, peak_ranks, wind_size, confidence_interval):
+        """
+        Послідовно обробляє піки кастомним методом у переданому порядку
+        :param dist: вибірка як np.array, коригується на місці
+        :param peak_positions: позиції піків у вибірці в порядку обробки
+        :param peak_ranks: порядкові номери обробки цих піків
+        :param wind_size: кількість індексів до та після піку що входять у вікно
+        :param confidence_interval: межі довірчого інтервалу середнього вибірки
+        :return: кортеж (np.array порядкових номерів скоригованих піків, np.array індексів скоригованих вимірів,
+        np.array значень цих вимірів до корекції)
+        """
+        lower, upper = confidence_interval
+        length = len(dist)
+        accepted_ranks = []
+        touched_indices = []
+        touched_values = []
+        for peak, rank in zip(peak_positions.tolist(), peak_ranks.tolist()):
+            window_start = max(0, peak - wind_size)
+            window_end = min(length, peak + wind_size + 1)
+            if window_end - window_start < 2:
+                continue
+
+            window = dist[window_start:window_end]
+            mean_window = (window.sum() - dist[peak]) / (window_end - window_start - 1)
+            if lower <= mean_window <= upper:
+                accepted_ranks.append(rank)
+                touched_indices.append(np.arange(window_start, window_end))
+                touched_values.append(window.copy())
+                dist[window_start:window_end] = (window + mean_window) / 2
+
+        if not accepted_ranks:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), dist[:0].copy()
+        return np.array(accepted_ranks), np.concatenate(touched_indices), np.concatenate(touched_values)
+
+    def start_stream(self, wind_size, threshold):
+        """
+        Готує детектор до потокової обробки: виділяє буфер останніх wind_size - 1 вимірів
+        та обнуляє лічильник абсолютних індексів
+        :param wind_size: розмір вікна застосованого для порівняльних операцій по виявленню АВ
+        :param threshold: калібраційний параметр для формул розрахунку довірчого інтервалу
+        """
+        if not self._is_sliding_wind_method:
+            raise Exception('Потоковий режим підтримується лише для методу sliding_wind')
+        if wind_size < 1:
+            raise Exception('Розмір вікна має бути не менше 1')
+
+        self._stream_wind_size = wind_size
+        self._stream_threshold = threshold
+        self._stream_buffer = np.empty(wind_size - 1)
+        self._stream_buffer_fill = 0
+        self._stream_position = 0
+
+    def push(self, value_batch):
+        """
+        Обробляє чергову порцію потоку. Вікна, що перетинають межу порцій, добудовуються з буфера попередніх
+        вимірів, тому результат збігається з обробкою всієї вибірки методом detect_and_clean.
+        Використана пам'ять залежить лише від розміру вікна та порції, а не від довжини потоку
+        :param value_batch: нова порція вимірів (будь-яка послідовність чисел)
+        :return: кортеж (очищена порція у вигляді np.array, абсолютні індекси аномалій у потоці)
+        """
+        if self._stream_buffer is None:
+            raise Exception('Перед обробкою потоку викличте start_stream()')
+
+        batch = np.asarray(value_batch, dtype=np.float64).ravel()
+        cleaned = batch.copy()
+        wind_size = self._stream_wind_size
+        history = self._stream_buffer[:self._stream_buffer_fill]
+        extended = np.concatenate((history, batch))
+        anomaly_indices = np.empty(0, dtype=np.int64)
+
+        if len(extended) >= wind_size:
+            rolling_stats = RollingStatistics(extended, wind_size)
+            moving_avg = rolling_stats.get_mean()
+            standard_deviations = rolling_stats.get_std()
+
+            # Буфер містить не більше wind_size - 1 вимірів, тож кожне повне вікно закінчується на новому вимірі
+            anomalies = np.abs(extended[wind_size - 1:] - moving_avg) > self._stream_threshold * standard_deviations
+
+            local_indices = np.flatnonzero(anomalies) + (wind_size - 1) - len(history)
+            cleaned[local_indices] = moving_avg[anomalies]
+            anomaly_indices = local_indices + self._stream_position
+
+        # Зберігаємо сирі (неочищені) виміри, бо саме по них рахується статистика у detect_and_clean
+        keep = min(wind_size - 1, len(extended))
+        self._stream_buffer[:keep] = extended[len(extended) - keep:]
+        self._stream_buffer_fill = keep
+        self._stream_position += len(batch)
+
+        return cleaned, anomaly_indices
+
+    def stream(self, chunks, wind_size, threshold):
+        """
+        Генератор потокової детекції аномалій по довільному ітерованому джерелу порцій
+        (наприклад, читання файлу частинами чи живий потік даних)
+        :param chunks: ітерований об'єкт з порціями вимірів
+        :param wind_size: розмір вікна застосованого для порівняльних операцій по виявленню АВ
+        :param threshold: калібраційний параметр для формул розрахунку довірчого інтервалу
+        :return: для кожної порції кортеж (очищена порція, абсолютні індекси аномалій)
+        """
+        self.start_stream(wind_size, threshold)
+        for chunk in chunks:
+            yield self.push(chunk)
+
+    def clean_series(self, series, wind_size, threshold, out=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Виконує детекцію методом ковзного вікна над великою (наприклад memory-mapped) вибіркою блоками,
+        використовуючи потоковий режим. Очищені значення записуються в out, тож у пам'яті одночасно
+        знаходиться лише один блок. Результат збігається з detect_and_clean
+        :param series: вибірка (np.array чи np.memmap з open_series)
+        :param wind_size: розмір вікна застосованого для порівняльних операцій по виявленню АВ
+        :param threshold: калібраційний параметр для формул розрахунку довірчого інтервалу
+        :param out: буфер довжини вибірки для очищених значень (наприклад np.memmap з create_series).
+        Може бути самою вибіркою, відкритою в режимі 'r+', бо блок читається до запису
+        :param chunk_size: кількість вимірів у блоці
+        :return: абсолютні індекси знайдених аномалій у вигляді np.array
+        """
+        if out is None:
+            out = np.empty(len(series))
+        if len(out) != len(series):
+            raise Exception('Довжина буфера out має дорівнювати довжині вибірки')
+
+        self.start_stream(wind_size, threshold)
+        found_indices = []
+        for start, chunk in iter_chunks(series, chunk_size):
+            cleaned, anomaly_indices = self.push(chunk)
+            out[start:start + len(cleaned)] = cleaned
+            found_indices.append(anomaly_indices)
+
+        self._found_anomaly_indices = np.concatenate(found_indices) if found_indices else np.empty(0, dtype=np.int64)
+        self._source_dist = None
+        self._anomaly_patch = None
+        self._cleaned_dist = out
+        return self._found_anomaly_indices
 
     def detection_score(self, true_anomaly_indices):
         """
         Вирахуовує параметри точності виявлення аномалій на основі списку фактичних індексів аномалій переданих ззовні
         :param true_anomaly_indices: список індексів фактичних аномалій вибірки
+        :return: DetectionScore (precision, recall, f1 - частки від 0 до 1)
+        """
+        length = len(self._cleaned_dist) if self._cleaned_dist is not None else len(self._source_dist)
+        score = self.score_indices(self._found_anomaly_indices, true_anomaly_indices, length)
+        print(f'Точність виявлення: {score.recall * 100}\nПрецизійність  виявлення: {score.precision * 100}')
+        return score
+
+    @staticmethod
+    def score_indices(found_indices, true_indices, length):
+        """
+        Порівнює знайдені та фактичні індекси аномалій через бітову маску фактичних аномалій,
+        тож перевірка кожного знайденого індексу займає O(1)
+        :param found_indices: індекси знайдених аномалій
+        :param true_indices: індекси фактичних аномалій
+        :param length: довжина вибірки
+        :return: DetectionScore
+        """
+        found_indices = np.unique(np.asarray(found_indices, dtype=np.int64))
+        true_mask = np.zeros(length, dtype=bool)
+        true_mask[np.asarray(true_indices, dtype=np.int64)] = True
+
+        actual = int(np.count_nonzero(true_mask))
+        true_positives = int(np.count_nonzero(true_mask[found_indices]))
+        precision = true_positives / len(found_indices) if len(found_indices) else 0.0
+        recall = true_positives / actual if actual else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        return DetectionScore(precision, recall, f1, true_positives, len(found_indices), actual)
+
+    def get_anomaly_patch(self):
+        """
+        Повертає зміни, внесені останнім викликом detect_and_clean: patch.revert() відновлює вибірку,
+        patch.apply() повторно очищує її без копіювання
+        :return: SeriesPatch
         """
-        found_true_anomalies = [i for i in self._found_anomaly_indices if i in true_anomaly_indices]
-        accuracy = len(found_true_anomalies) / len(true_anomaly_indices) * 100
-        precision = len(found_true_anomalies) / len(self._found_anomaly_indices) * 100
-        print(f'Точність виявлення: {accuracy}\nПрецизійність  виявлення: {precision}')
+        return self._anomaly_patch
 
     def get_distribution(self):
         """
-        Повертає очищену від аномальних значень вибірку
+        Повертає очищену від аномальних значень вибірку. Якщо detect_and_clean викликано без inplace та out,
+        очищена копія створюється при першому виклику
         :return: вибірка у форматі np.array
         """
+        if self._cleaned_dist is None and self._source_dist is not None:
+            self._cleaned_dist = self._anomaly_patch.materialize(self._source_dist)
+            self._source_dist = None
         return self._cleaned_dist
@@ -1,34 +1,77 @@
 import random
 
+import numpy as np
+
+from tools.series_patch import SeriesPatch
+
 
 class AnomalyGenerator:
     """
     Містить логіку генерації випадкових аномалій в переданій вибірці
     """
-    def __init__(self, dist):
+    def __init__(self, dist, rng=None):
         """
         Ініціалізує клас
         :param dist: продукт класу Distribution (tuple)
+        :param rng: np.random.Generator або seed для відтворюваного вибору аномалій, None - модуль random
         """
-        self._distribution = dist[0]
+        self._rng = None if rng is None else np.random.default_rng(rng)
+        self._source_distribution = dist[0]
+        self._distribution = None
         self._distribution_type = dist[1]
         self.anomaly_indexes = None
+        self._anomaly_patch = None
 
-    def create_anomalies(self, number, scale):
+    def create_anomalies(self, number, scale, inplace=False, out=None):
         """
-        Створює випадкові аномалії за обраною кількістю та множником значення виміру у вибірці
+        Створює випадкові аномалії за обраною кількістю та множником значення виміру у вибірці.
+        За замовчуванням передана вибірка не змінюється: аномалії повертаються розрідженою латкою,
+        а вибірка з аномаліями створюється лише при виклику get_distribution()
         :param number: кількість аномалій
         :param scale: множик що буде застосований до значення на яке припадає створення аномалії
+        :param inplace: True - застосувати аномалії до переданої вибірки на місці
+        :param out: буфер довжини вибірки, у який записується вибірка з аномаліями (несумісний з inplace)
+        :return: SeriesPatch з індексами аномалій, оригінальними та аномальними значеннями
         """
+        if inplace and out is not None:
+            raise Exception('Параметри inplace та out не можна використовувати одночасно')
+        if out is not None and len(out) != len(self._source_distribution):
+            raise Exception('Довжина буфера out має дорівнювати довжині вибірки')
+
         anomalies_scale = scale
-        anomaly_indexes = random.sample(range(0, len(self._distribution)), number)
+        if self._rng is None:
+            anomaly_indexes = random.sample(range(0, len(self._source_distribution)), number)
+        else:
+            anomaly_indexes = self._rng.choice(len(self._source_distribution), number, replace=False).tolist()
         self.anomaly_indexes = anomaly_indexes
 
-        self._distribution[anomaly_indexes] *= anomalies_scale
+        original_values = np.asarray(self._source_distribution)[anomaly_indexes]
+        self._anomaly_patch = SeriesPatch(anomaly_indexes, original_values, original_values * anomalies_scale)
+
+        self._distribution = None
+        if inplace:
+            self._distribution = self._anomaly_patch.apply(self._source_distribution)
+        elif out is not None:
+            out[:] = self._source_distribution
+            self._distribution = self._anomaly_patch.apply(out)
+
+        return self._anomaly_patch
+
+    def get_anomaly_patch(self):
+        """
+        Повертає латку останнього виклику create_anomalies
+        :return: SeriesPatch
+        """
+        return self._anomaly_patch
 
     def get_distribution(self):
         """
-        Повертає вибірку до якої застосовані аномальні виміри
+        Повертає вибірку до якої застосовані аномальні виміри. Якщо аномалії створено без inplace та out,
+        копія вибірки з аномаліями створюється при першому виклику
         :return: продукт класу Distribution (tuple)
         """
+        if self._distribution is None:
+            if self._anomaly_patch is None:
+                return self._source_distribution, self._distribution_type
+            self._distribution = self._anomaly_patch.materialize(self._source_distribution)
         return self._distribution, self._distribution_type
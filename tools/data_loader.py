@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_CACHE_DIR = os.environ.get('STAT_TOOLKIT_CACHE_DIR',
+                                   os.path.join(os.path.expanduser('~'), '.cache', 'stat_learning_toolkit'))
+
+
+class SpreadsheetCache:
+    """
+    Кешує таблиці Excel у колонковому форматі: числові стовпці зберігаються як .npy файли та читаються
+    через memory-map, інші стовпці - у JSON. Повільний розбір xls/xlsx виконується лише один раз,
+    кеш автоматично оновлюється при зміні вихідного файлу
+    """
+    _META_FILE = 'meta.json'
+    _FORMAT_VERSION = 1
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        """
+        Ініціалізує клас
+        :param cache_dir: директорія для збереження кешу
+        """
+        self._cache_dir = cache_dir
+
+    def load_arrays(self, path, sheet_name=0):
+        """
+        Повертає стовпці таблиці як масиви без копіювання: числові стовпці - read-only np.memmap
+        :param path: шлях до файлу Excel
+        :param sheet_name: назва чи номер аркуша
+        :return: словник {назва стовпця: np.array} у порядку стовпців таблиці
+        """
+        entry_dir, meta = self._get_entry(path, sheet_name)
+
+        arrays = {}
+        for column in meta['columns']:
+            if column['file'] is not None:
+                arrays[column['name']] = np.load(os.path.join(entry_dir, column['file']), mmap_mode='r')
+            else:
+                arrays[column['name']] = np.array(column['values'], dtype=object)
+        return arrays
+
+    def load_frame(self, path, sheet_name=0):
+        """
+        Повертає таблицю як pd.DataFrame, зібраний з кешованих стовпців
+        :param path: шлях до файлу Excel
+        :param sheet_name: назва чи номер аркуша
+        :return: pd.DataFrame
+        """
+        return pd.DataFrame(self.load_arrays(path, sheet_name))
+
+    def _get_entry(self, path, sheet_name):
+        """
+        Знаходить актуальний запис кешу для файлу або створює його.
+        Запис вважається актуальним, якщо збігаються час зміни та розмір файлу; якщо ні - порівнюється
+        хеш вмісту, і лише при зміні вмісту таблиця розбирається заново
+        :param path: шлях до файлу Excel
+        :param sheet_name: назва чи номер аркуша
+        :return: кортеж (директорія запису, метадані запису)
+        """
+        path = os.path.abspath(path)
+        key = hashlib.sha1(f'{path}|{sheet_name}'.encode('utf-8')).hexdigest()
+        entry_dir = os.path.join(self._cache_dir, key)
+        stat = os.stat(path)
+
+        meta = self._read_meta(entry_dir)
+        if meta is not None:
+            if meta['mtime_ns'] == stat.st_mtime_ns and meta['size'] == stat.st_size:
+                return entry_dir, meta
+
+            if meta['content_hash'] == self._get_content_hash(path):
+                meta['mtime_ns'] = stat.st_mtime_ns
+                meta['size'] = stat.st_size
+                self._write_meta(entry_dir, meta)
+                return entry_dir, meta
+
+        return entry_dir, self._build_entry(path, sheet_name, entry_dir, stat)
+
+    def _build_entry(self, path, sheet_name, entry_dir, stat):
+        """
+        Розбирає таблицю та записує її стовпці в кеш. Запис формується в тимчасовій директорії
+        і замінює попередній одним перейменуванням
+        :param path: абсолютний шлях до файлу Excel
+        :param sheet_name: назва чи номер аркуша
+        :param entry_dir: директорія запису кешу
+        :param stat: результат os.stat для файлу
+        :return: метадані нового запису
+        """
+        data = pd.read_excel(path, sheet_name=sheet_name)
+
+        os.makedirs(self._cache_dir, exist_ok=True)
+        build_dir = tempfile.mkdtemp(dir=self._cache_dir)
+
+        columns = []
+        for i, name in enumerate(data.columns):
+            values = data[name]
+            if values.dtype.kind in 'biufcmM':
+                file_name = f'column_{i}.npy'
+                np.save(os.path.join(build_dir, file_name), values.to_numpy())
+                columns.append({'name': name, 'file': file_name, 'values': None})
+            else:
+                columns.append({'name': name, 'file': None,
+                                'values': values.astype(object).where(values.notna(), None).tolist()})
+
+        meta = {
+            'version': self._FORMAT_VERSION,
+            'source': path,
+            'sheet_name': sheet_name,
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'content_hash': self._get_content_hash(path),
+            'columns': columns,
+        }
+        self._write_meta(build_dir, meta)
+
+        if os.path.isdir(entry_dir):
+            shutil.rmtree(entry_dir)
+        os.replace(build_dir, entry_dir)
+        return meta
+
+    def _read_meta(self, entry_dir):
+        """
+        :param entry_dir: директорія запису кешу
+        :return: метадані запису або None, якщо запису немає чи він іншої версії
+        """
+        try:
+            with open(os.path.join(entry_dir, self._META_FILE), encoding='utf-8') as meta_file:
+                meta = json.load(meta_file)
+        except (OSError, ValueError):
+            return None
+        return meta if meta.get('version') == self._FORMAT_VERSION else None
+
+    def _write_meta(self, entry_dir, meta):
+        """
+        :param entry_dir: директорія запису кешу
+        :param meta: метадані запису
+        """
+        with open(os.path.join(entry_dir, self._META_FILE), 'w', encoding='utf-8') as meta_file:
+            json.dump(meta, meta_file, ensure_ascii=False, default=str)
+
+    @staticmethod
+    def _get_content_hash(path):
+        """
+        :param path: шлях до файлу
+        :return: SHA-256 вмісту файлу, прочитаного блоками
+        """
+        content_hash = hashlib.sha256()
+        with open(path, 'rb') as source_file:
+            for block in iter(lambda: source_file.read(1 << 20), b''):
+                content_hash.update(block)
+        return content_hash.hexdigest()
+
+
+_default_cache = SpreadsheetCache()
+
+
+def read_spreadsheet(path, sheet_name=0):
+    """
+    Читає таблицю Excel через спільний кеш
+    :param path: шлях до файлу Excel
+    :param sheet_name: назва чи номер аркуша
+    :return: pd.DataFrame
+    """
+    return _default_cache.load_frame(path, sheet_name)
+
+
+def load_series(path, column, sheet_name=0):
+    """
+    Повертає один числовий стовпець таблиці Excel як read-only np.memmap без копіювання,
+    наприклад стовпець 'Продаж' з 'Oschadbank (USD).xls' як вибірку для моделей
+    :param path: шлях до файлу Excel
+    :param column: назва стовпця
+    :param sheet_name: назва чи номер аркуша
+    :return: одновимірний np.array
+    """
+    return _default_cache.load_arrays(path, sheet_name)[column]
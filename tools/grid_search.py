@@ -0,0 +1,161 @@
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from tools.anomaly_detector import AnomalyDetector
+
+
+# Стан процесу-виконавця: вибірка у спільній пам'яті та фактичні індекси аномалій
+_worker_memory = None
+_worker_series = None
+_worker_true_indices = None
+
+
+def _attach_shared_memory(name):
+    """
+    Під'єднується до існуючого блоку спільної пам'яті без реєстрації в resource tracker (Python 3.13+),
+    щоб блок звільнював лише процес, який його створив
+    :param name: назва блоку
+    :return: SharedMemory
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+def _init_worker(memory_name, length, dtype, true_indices):
+    """
+    Ініціалізує процес-виконавець: відкриває вибірку у спільній пам'яті як np.array без копіювання
+    :param memory_name: назва блоку спільної пам'яті
+    :param length: кількість вимірів
+    :param dtype: тип значень
+    :param true_indices: фактичні індекси аномалій
+    """
+    global _worker_memory, _worker_series, _worker_true_indices
+    _worker_memory = _attach_shared_memory(memory_name)
+    _worker_series = np.ndarray((length,), dtype=dtype, buffer=_worker_memory.buf)
+    _worker_series.flags.writeable = False
+    _worker_true_indices = true_indices
+
+
+def _evaluate(config):
+    """
+    Оцінює одну комбінацію параметрів на вибірці процесу-виконавця
+    :param config: кортеж (метод, розмір вікна, поріг)
+    :return: словник з параметрами та метриками виявлення
+    """
+    return _evaluate_config(_worker_series, _worker_true_indices, config)
+
+
+def _evaluate_config(series, true_indices, config):
+    """
+    :param series: вибірка (не змінюється)
+    :param true_indices: фактичні індекси аномалій
+    :param config: кортеж (метод, розмір вікна, поріг)
+    :return: словник з параметрами та метриками виявлення
+    """
+    method, wind_size, threshold = config
+    detector = AnomalyDetector(method)
+
+    start = time.perf_counter()
+    detector.detect_and_clean(series, wind_size, threshold)
+    elapsed = time.perf_counter() - start
+
+    score = AnomalyDetector.score_indices(detector._found_anomaly_indices, true_indices, len(series))
+    return {'method': method, 'wind_size': wind_size, 'threshold': threshold, **score._asdict(), 'time': elapsed}
+
+
+class AnomalyGridSearch:
+    """
+    Підбирає параметри AnomalyDetector перебором сітки (метод, розмір вікна, поріг).
+    Комбінації оцінюються паралельно в пулі процесів, вибірка передається процесам через спільну пам'ять,
+    а не копіюється у кожне завдання
+    """
+    def __init__(self, dist, true_anomaly_indices, processes=None):
+        """
+        Ініціалізує клас
+        :param dist: вибірка з аномалними значеннями як np.array
+        :param true_anomaly_indices: список індексів фактичних аномалій вибірки
+        :param processes: кількість процесів, None - кількість ядер, 1 - без пулу в поточному процесі
+        """
+        self._dist = np.ascontiguousarray(dist)
+        self._true_anomaly_indices = np.asarray(true_anomaly_indices, dtype=np.int64)
+        self._processes = processes or os.cpu_count() or 1
+        self._results = None
+
+    @staticmethod
+    def _get_grid(methods, wind_sizes, thresholds):
+        """
+        :param methods: назви методів
+        :param wind_sizes: розміри вікон
+        :param thresholds: пороги - список спільний для всіх методів, або словник {метод: список порогів},
+        бо для sliding_wind це кількість стандартних відхилень, а для custom - довірчий рівень
+        :return: список кортежів (метод, розмір вікна, поріг)
+        """
+        grid = []
+        for method in methods:
+            method_thresholds = thresholds[method] if isinstance(thresholds, dict) else thresholds
+            grid.extend(itertools.product([method], wind_sizes, method_thresholds))
+        if not grid:
+            raise Exception('Сітка параметрів порожня')
+        return grid
+
+    def run(self, methods, wind_sizes, thresholds, metric='f1'):
+        """
+        Оцінює всі комбінації параметрів
+        :param methods: назви методів ('sliding_wind', 'custom')
+        :param wind_sizes: розміри вікон
+        :param thresholds: пороги (список або словник {метод: список порогів})
+        :param metric: метрика для вибору найкращої комбінації ('precision', 'recall' або 'f1')
+        :return: кортеж (pd.DataFrame з результатами, відсортований за метрикою; словник найкращої комбінації)
+        """
+        grid = self._get_grid(methods, wind_sizes, thresholds)
+
+        if self._processes == 1 or len(grid) == 1:
+            rows = self._run_local(grid)
+        else:
+            rows = self._run_pool(grid)
+
+        results = pd.DataFrame(rows).sort_values(metric, ascending=False, kind='stable').reset_index(drop=True)
+        self._results = results
+        return results, results.iloc[0].to_dict()
+
+    def _run_local(self, grid):
+        """
+        Оцінює сітку в поточному процесі
+        :param grid: список комбінацій параметрів
+        :return: список словників результатів
+        """
+        return [_evaluate_config(self._dist, self._true_anomaly_indices, config) for config in grid]
+
+    def _run_pool(self, grid):
+        """
+        Копіює вибірку у спільну пам'ять один раз та розподіляє комбінації між процесами
+        :param grid: список комбінацій параметрів
+        :return: список словників результатів у порядку сітки
+        """
+        memory = shared_memory.SharedMemory(create=True, size=max(self._dist.nbytes, 1))
+        try:
+            np.ndarray(self._dist.shape, dtype=self._dist.dtype, buffer=memory.buf)[:] = self._dist
+
+            with ProcessPoolExecutor(max_workers=min(self._processes, len(grid)), initializer=_init_worker,
+                                     initargs=(memory.name, len(self._dist), self._dist.dtype.str,
+                                               self._true_anomaly_indices)) as executor:
+                chunk_size = max(1, len(grid) // (self._processes * 4))
+                return list(executor.map(_evaluate, grid, chunksize=chunk_size))
+        finally:
+            memory.close()
+            memory.unlink()
+
+    def get_results(self):
+        """
+        Повертає таблицю результатів останнього запуску
+        :return: pd.DataFrame
+        """
+        return self._results
@@ -0,0 +1,96 @@
+import numpy as np
+
+
+class StreamingHistogram:
+    """
+    Гістограма з фіксованою кількістю інтервалів, що накопичується по блоках вибірки.
+    Якщо межі значень наперед невідомі, вони визначаються першим блоком; коли наступні значення виходять за межі,
+    ширина інтервалів подвоюється (сусідні інтервали зливаються), тож пам'ять не залежить від об'єму вибірки,
+    а підрахунки залишаються точними
+    """
+    def __init__(self, bins=30, value_range=None):
+        """
+        Ініціалізує клас
+        :param bins: парна кількість інтервалів
+        :param value_range: кортеж (мінімум, максимум) або None - визначити за першим блоком
+        """
+        if bins < 2 or bins % 2:
+            raise Exception('Кількість інтервалів гістограми має бути парним числом не менше 2')
+
+        self._bins = bins
+        self._counts = np.zeros(bins, dtype=np.int64)
+        self._low = None
+        self._width = None
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+
+        if value_range is not None:
+            self._set_range(*value_range)
+
+    def _set_range(self, low, high):
+        """
+        :param low: нижня межа першого інтервалу
+        :param high: верхня межа останнього інтервалу
+        """
+        self._low = float(low)
+        self._width = (float(high) - self._low) / self._bins if high > low else 1.0
+
+    def update(self, chunk):
+        """
+        Додає блок значень до гістограми (нескінченні значення та NaN пропускаються)
+        :param chunk: блок вибірки (np.array чи будь-яка послідовність чисел)
+        """
+        chunk = np.asarray(chunk, dtype=np.float64).ravel()
+        chunk = chunk[np.isfinite(chunk)]
+        if not len(chunk):
+            return
+
+        chunk_min = chunk.min()
+        chunk_max = chunk.max()
+        if self._low is None:
+            self._set_range(chunk_min, chunk_max)
+        self._expand(chunk_min, chunk_max)
+
+        bin_indices = ((chunk - self._low) / self._width).astype(np.int64)
+        np.clip(bin_indices, 0, self._bins - 1, out=bin_indices)  # Максимум потрапляє в останній інтервал
+        self._counts += np.bincount(bin_indices, minlength=self._bins)
+
+        self.count += len(chunk)
+        self.min = min(self.min, chunk_min)
+        self.max = max(self.max, chunk_max)
+
+    def _expand(self, value_min, value_max):
+        """
+        Подвоює ширину інтервалів, доки всі значення не потраплять у межі гістограми
+        :param value_min: мінімальне значення блоку
+        :param value_max: максимальне значення блоку
+        """
+        merged_indices = np.arange(self._bins) // 2
+        while value_min < self._low or value_max > self._low + self._width * self._bins:
+            if value_min < self._low:
+                # Розширення вліво: старий діапазон займає праву половину нового
+                self._low -= self._width * self._bins
+                self._counts = np.bincount(merged_indices + self._bins // 2, weights=self._counts,
+                                           minlength=self._bins).astype(np.int64)
+            else:
+                self._counts = np.bincount(merged_indices, weights=self._counts,
+                                           minlength=self._bins).astype(np.int64)
+            self._width *= 2
+
+    def get_histogram(self):
+        """
+        :return: кортеж (кількість значень в інтервалах, межі інтервалів довжиною bins + 1)
+        """
+        if self._low is None:
+            return self._counts.copy(), np.zeros(self._bins + 1)
+        return self._counts.copy(), self._low + self._width * np.arange(self._bins + 1)
+
+    def get_density(self):
+        """
+        :return: кортеж (нормована щільність в інтервалах, межі інтервалів) - як np.histogram(density=True)
+        """
+        counts, edges = self.get_histogram()
+        if not self.count:
+            return counts.astype(np.float64), edges
+        return counts / (self.count * self._width), edges
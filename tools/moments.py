@@ -0,0 +1,185 @@
+from collections import namedtuple
+
+import numpy as np
+
+
+Moments = namedtuple('Moments', ['count', 'mean', 'var', 'std', 'skew', 'kurt', 'min', 'max'])
+
+
+class MomentsAccumulator:
+    """
+    Накопичує кількість, середнє, центральні моменти 2-4 порядку, мінімум та максимум вибірки по блоках.
+    Моменти блоку рахуються векторно, а з попередніми результатами об'єднуються формулами паралельного
+    алгоритму Велфорда (Chan / Pébay), тож часткові результати, отримані окремо (наприклад в різних процесах),
+    можна злити методом merge без повторного читання даних
+    """
+    def __init__(self):
+        """
+        Ініціалізує порожній накопичувач
+        """
+        self.count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._m3 = 0.0
+        self._m4 = 0.0
+        self._min = np.inf
+        self._max = -np.inf
+
+    def update(self, chunk):
+        """
+        Додає блок значень
+        :param chunk: блок вибірки (np.array чи будь-яка послідовність чисел)
+        :return: self
+        """
+        chunk = np.asarray(chunk, dtype=np.float64).ravel()
+        if not len(chunk):
+            return self
+
+        chunk_mean = chunk.mean()
+        deviations = chunk - chunk_mean
+        squared = deviations * deviations
+
+        chunk_moments = MomentsAccumulator()
+        chunk_moments.count = len(chunk)
+        chunk_moments._mean = chunk_mean
+        chunk_moments._m2 = squared.sum()
+        chunk_moments._m3 = (squared * deviations).sum()
+        chunk_moments._m4 = (squared * squared).sum()
+        chunk_moments._min = chunk.min()
+        chunk_moments._max = chunk.max()
+        return self.merge(chunk_moments)
+
+    def merge(self, other):
+        """
+        Об'єднує з іншим накопичувачем на місці
+        :param other: MomentsAccumulator
+        :return: self
+        """
+        if not other.count:
+            return self
+        if not self.count:
+            self.count, self._mean, self._min, self._max = other.count, other._mean, other._min, other._max
+            self._m2, self._m3, self._m4 = other._m2, other._m3, other._m4
+            return self
+
+        n_a, n_b = self.count, other.count
+        n = n_a + n_b
+        delta = other._mean - self._mean
+        delta_n = delta / n
+
+        m2 = self._m2 + other._m2 + delta * delta_n * n_a * n_b
+        m3 = (self._m3 + other._m3 + delta * delta_n ** 2 * n_a * n_b * (n_a - n_b)
+              + 3 * delta_n * (n_a * other._m2 - n_b * self._m2))
+        m4 = (self._m4 + other._m4 + delta * delta_n ** 3 * n_a * n_b * (n_a * n_a - n_a * n_b + n_b * n_b)
+              + 6 * delta_n ** 2 * (n_a * n_a * other._m2 + n_b * n_b * self._m2)
+              + 4 * delta_n * (n_a * other._m3 - n_b * self._m3))
+
+        self.count = n
+        self._mean += delta_n * n_b
+        self._m2, self._m3, self._m4 = m2, m3, m4
+        self._min = min(self._min, other._min)
+        self._max = max(self._max, other._max)
+        return self
+
+    def get_moments(self):
+        """
+        :return: Moments (дисперсія та стандартне відхилення - як у np.var/np.std, асиметрія та ексцес -
+        вибіркові коефіцієнти, ексцес відносно нормального розподілу)
+        """
+        if not self.count:
+            return Moments(0, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan)
+
+        var = self._m2 / self.count
+        if self._m2 > 0:
+            skew = np.sqrt(self.count) * self._m3 / self._m2 ** 1.5
+            kurt = self.count * self._m4 / (self._m2 * self._m2) - 3
+        else:
+            skew, kurt = np.nan, np.nan
+        return Moments(self.count, self._mean, var, np.sqrt(var), skew, kurt, self._min, self._max)
+
+
+class QuantileSketch:
+    """
+    Наближені квантилі вибірки, що надходить блоками (спрощений KLL-ескіз).
+    Значення зберігаються у рівнях-компакторах місткістю capacity: коли рівень переповнюється, він сортується,
+    і кожне друге значення (з випадковим зсувом) переходить на наступний рівень з подвоєною вагою.
+    Пам'ять - O(capacity * log(n / capacity)), похибка рангу зменшується зі зростанням capacity.
+    Ескізи, побудовані окремо, об'єднуються методом merge
+    """
+    def __init__(self, capacity=2048, seed=None):
+        """
+        Ініціалізує клас
+        :param capacity: місткість рівня
+        :param seed: seed генератора випадкових зсувів
+        """
+        if capacity < 2:
+            raise Exception('Місткість рівня ескізу має бути не менше 2')
+
+        self._capacity = capacity
+        self._rng = np.random.default_rng(seed)
+        self._levels = [np.empty(0)]
+        self.count = 0
+
+    def update(self, chunk):
+        """
+        Додає блок значень (NaN пропускаються)
+        :param chunk: блок вибірки (np.array чи будь-яка послідовність чисел)
+        :return: self
+        """
+        chunk = np.asarray(chunk, dtype=np.float64).ravel()
+        chunk = chunk[~np.isnan(chunk)]
+        self.count += len(chunk)
+        self._levels[0] = np.concatenate((self._levels[0], chunk))
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """
+        Об'єднує з іншим ескізом на місці
+        :param other: QuantileSketch
+        :return: self
+        """
+        for level, values in enumerate(other._levels):
+            if level == len(self._levels):
+                self._levels.append(np.empty(0))
+            self._levels[level] = np.concatenate((self._levels[level], values))
+        self.count += other.count
+        self._compress()
+        return self
+
+    def _compress(self):
+        """
+        Ущільнює переповнені рівні, переносячи половину значень на наступний рівень
+        """
+        level = 0
+        while level < len(self._levels):
+            values = self._levels[level]
+            if len(values) > self._capacity:
+                values = np.sort(values)
+                # Непарне значення залишається на рівні, щоб сумарна вага не змінилась
+                kept = values[len(values) - len(values) % 2:]
+                promoted = values[self._rng.integers(2):len(values) - len(values) % 2:2]
+
+                if level + 1 == len(self._levels):
+                    self._levels.append(np.empty(0))
+                self._levels[level] = kept
+                self._levels[level + 1] = np.concatenate((self._levels[level + 1], promoted))
+            level += 1
+
+    def quantile(self, q):
+        """
+        :param q: рівень квантиля або масив рівнів від 0 до 1
+        :return: наближене значення квантиля (чи np.array значень)
+        """
+        if not self.count:
+            raise Exception('Ескіз порожній')
+
+        values = np.concatenate(self._levels)
+        weights = np.concatenate([np.full(len(level_values), 2.0 ** level)
+                                  for level, level_values in enumerate(self._levels)])
+        order = np.argsort(values, kind='stable')
+        cumulative = np.cumsum(weights[order])
+
+        ranks = np.asarray(q, dtype=np.float64) * cumulative[-1]
+        positions = np.minimum(np.searchsorted(cumulative, ranks, side='left'), len(values) - 1)
+        return values[order][positions]
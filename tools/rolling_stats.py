@@ -0,0 +1,92 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class RollingStatistics:
+    """
+    Обчислює ковзні середнє, дисперсію та стандартне відхилення за один прохід по вибірці
+    на основі кумулятивних сум, без циклу по кожному вікну
+    """
+    _BLOCK_SIZE = 64  # Кількість вікон, що рахуються від спільного опорного значення
+    def __init__(self, dist, wind_size):
+        """
+        Ініціалізує клас та одразу вираховує ковзні характеристики
+        :param dist: вибірка у вигляді np.array
+        :param wind_size: розмір ковзного вікна
+        """
+        if wind_size < 1:
+            raise Exception('Розмір вікна має бути не менше 1')
+        if wind_size > len(dist):
+            raise Exception('Розмір вікна не може перевищувати розмір вибірки')
+
+        self._wind_size = wind_size
+        self._moving_avg = None
+        self._moving_var = None
+        self._calculate(np.asarray(dist, dtype=np.float64))
+
+    def _calculate(self, dist):
+        """
+        Вираховує ковзні середнє та дисперсію блоками по _BLOCK_SIZE вікон. Для першого вікна блоку суми
+        відхилень від його середнього рахуються точно, а для наступних вікон блоку - оновлюються різницями
+        значень, що входять у вікно та виходять з нього (векторно через cumsum по блоках).
+        Відхилення беруться від локального середнього блоку, тож тренд чи великий зсув ряду не призводять
+        до віднімання великих накопичених сум
+        :param dist: вибірка у вигляді np.array float64
+        """
+        wind_size = self._wind_size
+        if wind_size == 1:
+            self._moving_avg = dist.copy()
+            self._moving_var = np.zeros(len(dist))
+            return
+
+        windows_number = len(dist) - wind_size + 1
+        block_size = max(self._BLOCK_SIZE, wind_size)  # Точний підрахунок перших вікон - O(len(dist))
+        blocks_number = -(-windows_number // block_size)
+
+        anchor_windows = sliding_window_view(dist, wind_size)[::block_size]
+        reference = anchor_windows.mean(axis=1)
+        anchor_deviations = anchor_windows - reference[:, None]
+
+        # Опорне значення кожного вікна - середнє першого вікна його блоку
+        window_reference = np.repeat(reference, block_size)[:windows_number]
+
+        # Приріст сум відхилень при зсуві вікна на одну позицію, для першого вікна блоку - точні суми
+        sum_increments = np.zeros(blocks_number * block_size)
+        sum_sq_increments = np.zeros(blocks_number * block_size)
+        entering = dist[wind_size:]
+        leaving = dist[:-wind_size]
+        np.subtract(entering, leaving, out=sum_increments[1:windows_number])
+        np.multiply(sum_increments[1:windows_number],
+                    (entering - window_reference[1:]) + (leaving - window_reference[1:]),
+                    out=sum_sq_increments[1:windows_number])
+        sum_increments[::block_size] = anchor_deviations.sum(axis=1)
+        sum_sq_increments[::block_size] = (anchor_deviations * anchor_deviations).sum(axis=1)
+
+        window_sum = np.cumsum(sum_increments.reshape(blocks_number, block_size), axis=1).ravel()[:windows_number]
+        window_sum_sq = np.cumsum(sum_sq_increments.reshape(blocks_number, block_size),
+                                  axis=1).ravel()[:windows_number]
+
+        centered_avg = window_sum / wind_size
+        moving_var = window_sum_sq / wind_size - centered_avg * centered_avg
+        np.maximum(moving_var, 0, out=moving_var)  # Прибираємо від'ємні значення від похибки округлення
+
+        self._moving_avg = centered_avg + window_reference
+        self._moving_var = moving_var
+
+    def get_mean(self):
+        """
+        :return: ковзне середнє довжиною len(dist) - wind_size + 1 у вигляді np.array
+        """
+        return self._moving_avg
+
+    def get_variance(self):
+        """
+        :return: ковзна дисперсія (як у np.var, ddof=0) у вигляді np.array
+        """
+        return self._moving_var
+
+    def get_std(self):
+        """
+        :return: ковзне стандартне відхилення (як у np.std, ddof=0) у вигляді np.array
+        """
+        return np.sqrt(self._moving_var)
@@ -1,29 +1,198 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from email.message import Message
+from html.parser import HTMLParser
+
 import numpy as np
 from bs4 import BeautifulSoup
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import chardet
 import pandas as pd
 
+try:
+    from lxml import etree
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+from tools.data_loader import DEFAULT_CACHE_DIR
+
+
+DEFAULT_HTTP_CACHE_DIR = os.path.join(DEFAULT_CACHE_DIR, 'http')
+DEFAULT_TIMEOUT = 30  # Секунди на з'єднання та читання відповіді
+
+# Стовпці таблиці народжуваності та смертності з db.ukrcensus.gov.ua
+DEFAULT_COLUMNS = ('Народжуваність загальна', 'Смертність загальна',
+                   'Народжуваність в міській місцевості', 'Смертність в міській місцевості',
+                   'Народжуваність в сільській місцевості', 'Смертність в сільській місцевості')
+
+_META_CHARSET_PATTERN = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w.:-]+)', re.IGNORECASE)
+_DETECTION_PREFIX_SIZE = 64 * 1024  # Обсяг початку сторінки, за яким chardet визначає кодування
+
+# Кожен потік має власну сесію requests: Session не гарантує потокобезпечність,
+# а пул з'єднань (keep-alive) сесії повторно використовується для всіх запитів потоку
+_thread_local = threading.local()
+
+
+def _get_session():
+    """
+    :return: requests.Session поточного потоку з повторними спробами при мережевих помилках та відповідях 429/5xx
+    """
+    session = getattr(_thread_local, 'session', None)
+    if session is None:
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=('GET', 'HEAD'))
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=4, pool_maxsize=4)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _thread_local.session = session
+    return session
+
 
 class WebScrapper:
 
-    def __init__(self, url):
+    def __init__(self, url, timeout=DEFAULT_TIMEOUT, cache_dir=DEFAULT_HTTP_CACHE_DIR):
         """
         Виконує запит по зазначеному посиланню, декодує текст відповіді
+        :param url: посилання на сторінку
+        :param timeout: обмеження часу запиту в секундах
+        :param cache_dir: директорія дискового кешу відповідей, None - без кешу
         """
-        response = requests.get(url)
+        content, content_type = self._fetch(url, timeout, cache_dir)
+        self._html_content = self._decode(content, content_type)
 
-        if response.status_code == 200:
-            encoding = chardet.detect(response.content)['encoding']
-            self._html_content = response.content.decode(encoding)
-        else:
+    @classmethod
+    def from_html(cls, html_content):
+        """
+        Створює об'єкт з уже отриманого HTML коду без мережевого запиту
+        :param html_content: HTML код сторінки (str або bytes)
+        :return: WebScrapper
+        """
+        scrapper = cls.__new__(cls)
+        if isinstance(html_content, bytes):
+            html_content = cls._decode(html_content, None)
+        scrapper._html_content = html_content
+        return scrapper
+
+    @classmethod
+    def fetch_many(cls, urls, max_workers=8, timeout=DEFAULT_TIMEOUT, cache_dir=DEFAULT_HTTP_CACHE_DIR):
+        """
+        Завантажує кілька сторінок паралельно в пулі потоків; з'єднання кожного потоку повторно використовуються
+        :param urls: список посилань
+        :param max_workers: кількість потоків
+        :param timeout: обмеження часу запиту в секундах
+        :param cache_dir: директорія дискового кешу відповідей, None - без кешу
+        :return: список WebScrapper у порядку посилань
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(lambda url: cls(url, timeout, cache_dir), urls))
+
+    @staticmethod
+    def _fetch(url, timeout, cache_dir):
+        """
+        Виконує GET запит. Якщо відповідь є в кеші, запит стає умовним (If-None-Match / If-Modified-Since),
+        і при відповіді 304 тіло береться з диску
+        :param url: посилання на сторінку
+        :param timeout: обмеження часу запиту в секундах
+        :param cache_dir: директорія кешу або None
+        :return: кортеж (тіло відповіді bytes, заголовок Content-Type)
+        """
+        headers = {}
+        cached_meta = None
+        if cache_dir is not None:
+            key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+            meta_path = os.path.join(cache_dir, f'{key}.json')
+            body_path = os.path.join(cache_dir, f'{key}.body')
+            try:
+                with open(meta_path, encoding='utf-8') as meta_file:
+                    cached_meta = json.load(meta_file)
+            except (OSError, ValueError):
+                cached_meta = None
+
+            if cached_meta is not None and os.path.exists(body_path):
+                if cached_meta.get('etag'):
+                    headers['If-None-Match'] = cached_meta['etag']
+                if cached_meta.get('last_modified'):
+                    headers['If-Modified-Since'] = cached_meta['last_modified']
+
+        response = _get_session().get(url, headers=headers, timeout=timeout)
+
+        if response.status_code == 304 and headers:
+            with open(body_path, 'rb') as body_file:
+                return body_file.read(), cached_meta.get('content_type')
+
+        if response.status_code != 200:
             raise Exception(f'Response code: {response.status_code}')
 
-    def get_table(self):
+        content_type = response.headers.get('Content-Type')
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if cache_dir is not None and (etag or last_modified):
+            os.makedirs(cache_dir, exist_ok=True)
+            # Тимчасові файли замінюються одним перейменуванням, щоб паралельні потоки не читали недописаний запис
+            suffix = f'.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(body_path + suffix, 'wb') as body_file:
+                body_file.write(response.content)
+            os.replace(body_path + suffix, body_path)
+            with open(meta_path + suffix, 'w', encoding='utf-8') as meta_file:
+                json.dump({'url': url, 'etag': etag, 'last_modified': last_modified,
+                           'content_type': content_type}, meta_file)
+            os.replace(meta_path + suffix, meta_path)
+
+        return response.content, content_type
+
+    @staticmethod
+    def _decode(content, content_type):
+        """
+        Декодує тіло відповіді. Кодування береться з параметра charset заголовку Content-Type
+        (без типового для requests ISO-8859-1 для text/html), потім з тегу <meta> на початку сторінки,
+        і лише потім визначається chardet за початком сторінки, а не за всім документом
+        :param content: тіло відповіді bytes
+        :param content_type: заголовок Content-Type або None
+        :return: текст сторінки
+        """
+        candidates = []
+        if content_type:
+            header = Message()
+            header['Content-Type'] = content_type
+            candidates.append(header.get_content_charset())
+
+        meta_match = _META_CHARSET_PATTERN.search(content[:4096])
+        if meta_match:
+            candidates.append(meta_match.group(1).decode('ascii', 'ignore'))
+
+        for encoding in candidates:
+            if not encoding:
+                continue
+            try:
+                return content.decode(encoding)
+            except (LookupError, UnicodeDecodeError):
+                continue
+
+        encoding = chardet.detect(content[:_DETECTION_PREFIX_SIZE])['encoding'] or 'utf-8'
+        return content.decode(encoding, errors='replace')
+
+    def get_table(self, columns=None, fast=True):
         """
         Виокремлює дані таблиці з HTML коду відповіді та формує її як Pandas Dataframe
+        :param columns: назви стовпців даних (без першого стовпця з назвами рядків), за замовчуванням DEFAULT_COLUMNS.
+        Враховуються рядки, що мають щонайменше len(columns) + 1 комірок
+        :param fast: True - потоковий розбір (lxml або html.parser зі стандартної бібліотеки) до кінця таблиці
+        зі значеннями одразу в np.array, False - розбір всього документу через BeautifulSoup
         :return: Pandas Dataframe об'єкт з даними таблиці на сайті
         """
+        columns = list(DEFAULT_COLUMNS if columns is None else columns)
+        if fast:
+            labels, values = _TableExtractor(len(columns) + 1).extract(self._html_content)
+            return pd.DataFrame(values, index=labels, columns=columns)
+
         data = {}
 
         soup = BeautifulSoup(self._html_content, 'html.parser')
@@ -31,13 +200,159 @@ class WebScrapper:
         rows = table.find_all('tr')
         for row in rows:
             cells = row.find_all('td')
-            if len(cells) < 7:
+            if len(cells) < len(columns) + 1:
                 continue
-            data[cells[0].text] = [float(cell.text.replace(',','.')) for cell in cells[1:]]
+            data[cells[0].text] = [float(cell.text.replace(',','.')) for cell in cells[1:len(columns) + 1]]
 
         dataframe = pd.DataFrame(data).transpose()
-        dataframe.columns = ['Народжуваність загальна', 'Смертність загальна',
-                             'Народжуваність в міській місцевості', 'Смертність в міській місцевості',
-                             'Народжуваність в сільській місцевості', 'Смертність в сільській місцевості']
+        dataframe.columns = columns
 
         return dataframe
+
+
+class _TableExtractor:
+    """
+    Потоково знаходить першу таблицю з класом pxtable та збирає значення її рядків у np.array float64.
+    Документ подається парсеру частинами, і розбір припиняється, щойно таблиця закінчується
+    """
+    _FEED_SIZE = 64 * 1024  # Кількість символів документу, що подається парсеру за раз
+
+    def __init__(self, min_cells):
+        """
+        Ініціалізує клас
+        :param min_cells: мінімальна кількість комірок рядка (назва рядка та значення стовпців)
+        """
+        self._min_cells = min_cells
+        self._labels = []
+        self._row_of_label = {}
+        self._values = np.empty((256, min_cells - 1))
+        self._table_depth = 0  # Глибина вкладеності таблиць всередині pxtable, 0 - поза таблицею
+        self._cells = None
+        self._cell_text = None
+        self.is_done = False
+
+    def extract(self, html_content):
+        """
+        :param html_content: HTML код сторінки
+        :return: кортеж (список назв рядків, np.array значень розміром (кількість рядків, кількість стовпців))
+        """
+        if LXML_AVAILABLE:
+            self._extract_lxml(html_content)
+        else:
+            self._extract_stdlib(html_content)
+
+        if not self.is_done and not self._table_depth:
+            raise Exception('Таблицю pxtable не знайдено')
+        return self._labels, self._values[:len(self._labels)].copy()
+
+    def _extract_lxml(self, html_content):
+        """
+        Розбір C-парсером lxml. Парсер повідомляє лише про теги table та tr, тож рядок обробляється
+        однією подією, а тексти його комірок збирає сам lxml
+        """
+        parser = etree.HTMLPullParser(events=('start', 'end'), tag=('table', 'tr'))
+        for start in range(0, len(html_content), self._FEED_SIZE):
+            parser.feed(html_content[start:start + self._FEED_SIZE])
+            for event, element in parser.read_events():
+                if element.tag == 'table':
+                    if event == 'start':
+                        self.handle_start('table', element.get('class'))
+                    else:
+                        self.handle_end('table')
+                elif event == 'end' and self._table_depth == 1:
+                    self.handle_row([''.join(cell.itertext()) for cell in element.iterchildren('td')])
+                    element.clear()  # Звільняємо вже оброблені рядки
+                if self.is_done:
+                    return
+        parser.close()
+
+    def _extract_stdlib(self, html_content):
+        """
+        Розбір html.parser зі стандартної бібліотеки, якщо lxml не встановлено
+        """
+        parser = _StdlibTableParser(self)
+        for start in range(0, len(html_content), self._FEED_SIZE):
+            parser.feed(html_content[start:start + self._FEED_SIZE])
+            if self.is_done:
+                return
+        parser.close()
+
+    def handle_start(self, tag, class_attribute):
+        """
+        :param tag: назва тегу
+        :param class_attribute: значення атрибуту class або None
+        """
+        if tag == 'table':
+            if self._table_depth:
+                self._table_depth += 1
+            elif not self.is_done and class_attribute and 'pxtable' in class_attribute.split():
+                self._table_depth = 1
+        elif tag == 'tr' and self._table_depth == 1:
+            self._cells = []
+        elif tag == 'td' and self._cells is not None and self._table_depth == 1:
+            self._cell_text = []
+
+    def handle_data(self, data):
+        """
+        :param data: текст всередині комірки
+        """
+        if self._cell_text is not None:
+            self._cell_text.append(data)
+
+    def handle_end(self, tag):
+        """
+        :param tag: назва тегу
+        """
+        if tag == 'td' and self._cell_text is not None and self._table_depth == 1:
+            self._cells.append(''.join(self._cell_text))
+            self._cell_text = None
+        elif tag == 'tr' and self._cells is not None and self._table_depth == 1:
+            self.handle_row(self._cells)
+            self._cells = None
+            self._cell_text = None
+        elif tag == 'table' and self._table_depth:
+            self._table_depth -= 1
+            self.is_done = self._table_depth == 0
+
+    def handle_row(self, cells):
+        """
+        Записує значення рядка таблиці у масив, збільшуючи його вдвічі при заповненні.
+        Рядки з меншою за min_cells кількістю комірок пропускаються, а рядок з уже наявною назвою
+        перезаписує попередній, як у словнику
+        :param cells: тексти комірок рядка
+        """
+        if len(cells) < self._min_cells:
+            return
+        label = cells[0]
+        row = self._row_of_label.get(label)
+        if row is None:
+            row = len(self._labels)
+            if row == len(self._values):
+                self._values = np.resize(self._values, (2 * len(self._values), self._values.shape[1]))
+            self._row_of_label[label] = row
+            self._labels.append(label)
+        self._values[row] = [float(cell.replace(',', '.')) for cell in cells[1:self._min_cells]]
+
+
+class _StdlibTableParser(HTMLParser):
+    """
+    Адаптер html.parser до _TableExtractor
+    """
+    def __init__(self, extractor):
+        """
+        :param extractor: _TableExtractor, що отримує події розбору
+        """
+        super().__init__()
+        self._extractor = extractor
+
+    def handle_starttag(self, tag, attrs):
+        if not self._extractor.is_done:
+            self._extractor.handle_start(tag, dict(attrs).get('class'))
+
+    def handle_data(self, data):
+        if not self._extractor.is_done:
+            self._extractor.handle_data(data)
+
+    def handle_endtag(self, tag):
+        if not self._extractor.is_done:
+            self._extractor.handle_end(tag)
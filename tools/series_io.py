@@ -0,0 +1,44 @@
+import os
+
+import numpy as np
+
+
+DEFAULT_CHUNK_SIZE = 1 << 20  # Кількість вимірів, що обробляються за один крок при поблоковій обробці
+
+
+def open_series(path, mode='r', dtype=np.float64):
+    """
+    Відкриває сирий бінарний файл вимірів (без заголовку) як одновимірний np.memmap.
+    Дані не завантажуються в пам'ять, операційна система підтягує лише сторінки, до яких звертаються
+    :param path: шлях до файлу
+    :param mode: 'r' - лише читання, 'r+' - читання та запис на місці, 'c' - копіювання при записі
+    :param dtype: тип значень у файлі
+    :return: np.memmap
+    """
+    itemsize = np.dtype(dtype).itemsize
+    size = os.path.getsize(path)
+    if size % itemsize:
+        raise Exception(f'Розмір файлу {path} не кратний розміру значення {dtype}')
+    return np.memmap(path, dtype=dtype, mode=mode, shape=(size // itemsize,))
+
+
+def create_series(path, length, dtype=np.float64):
+    """
+    Створює (або перезаписує) бінарний файл заданої довжини та відкриває його як np.memmap для запису результатів
+    :param path: шлях до файлу
+    :param length: кількість вимірів
+    :param dtype: тип значень
+    :return: np.memmap у режимі 'w+'
+    """
+    return np.memmap(path, dtype=dtype, mode='w+', shape=(length,))
+
+
+def iter_chunks(series, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Ітерує по вибірці блоками-переглядами (без копіювання)
+    :param series: np.array або np.memmap
+    :param chunk_size: кількість вимірів у блоці
+    :return: генератор кортежів (індекс початку блоку, блок)
+    """
+    for start in range(0, len(series), chunk_size):
+        yield start, series[start:start + chunk_size]
@@ -0,0 +1,51 @@
+import numpy as np
+
+
+class SeriesPatch:
+    """
+    Розріджена зміна вибірки: індекси змінених вимірів з їх оригінальними та новими значеннями.
+    Дозволяє застосувати чи відкотити зміни без копіювання всієї вибірки
+    """
+    def __init__(self, indices, original_values, new_values):
+        """
+        Ініціалізує клас
+        :param indices: індекси змінених вимірів
+        :param original_values: значення вимірів до зміни
+        :param new_values: значення вимірів після зміни
+        """
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.original_values = np.asarray(original_values)
+        self.new_values = np.asarray(new_values)
+
+        if not len(self.indices) == len(self.original_values) == len(self.new_values):
+            raise Exception('Кількість індексів та значень латки має збігатися')
+
+    def __len__(self):
+        return len(self.indices)
+
+    def apply(self, series):
+        """
+        Записує нові значення у вибірку на місці
+        :param series: вибірка у вигляді np.array (чи np.memmap)
+        :return: та сама вибірка
+        """
+        series[self.indices] = self.new_values
+        return series
+
+    def revert(self, series):
+        """
+        Повертає оригінальні значення у вибірку на місці
+        :param series: вибірка у вигляді np.array (чи np.memmap)
+        :return: та сама вибірка
+        """
+        series[self.indices] = self.original_values
+        return series
+
+    def materialize(self, series):
+        """
+        Створює змінену копію вибірки, не торкаючись оригіналу
+        :param series: оригінальна вибірка
+        :return: нова вибірка у вигляді np.array з застосованою латкою
+        """
+        dtype = np.result_type(np.asarray(series).dtype, self.new_values.dtype)
+        return self.apply(np.array(series, dtype=dtype))
@@ -1,6 +1,9 @@
 import numpy as np
 import matplotlib.pyplot as plt
 
+from tools.moments import MomentsAccumulator, QuantileSketch
+from tools.series_io import iter_chunks
+
 
 class Statistic:
 
@@ -13,11 +16,37 @@ class Statistic:
 
     def _get_stats(self, ):
         """
-        Проводить вирахування параметрів вибірки та записує їх в словник self._stats_dict
+        Проводить вирахування параметрів вибірки та записує їх в словник self._stats_dict.
+        Вибірка читається один раз блоками, тож підходить і для np.memmap
+        """
+        moments = self.describe(chunk for _, chunk in iter_chunks(self._model))
+
+        self._stats_dict['Матемтичне очікування'] = moments.mean
+        self._stats_dict['Дисперсія'] = moments.var
+        self._stats_dict['Стандартне відхилення'] = moments.std
+        self._stats_dict['Коефіцієнт асиметрії'] = moments.skew
+        self._stats_dict['Коефіцієнт ексцесу'] = moments.kurt
+        self._stats_dict['Мінімум'] = moments.min
+        self._stats_dict['Максимум'] = moments.max
+
+    @staticmethod
+    def describe(chunks, quantiles=None):
+        """
+        Описує вибірку, що надходить блоками (наприклад читання великого файлу частинами), за один прохід
+        :param chunks: ітерований об'єкт з блоками вибірки
+        :param quantiles: рівні квантилів від 0 до 1, що оцінюються наближено через QuantileSketch
+        :return: Moments, або кортеж (Moments, np.array наближених квантилів), якщо передано quantiles
         """
-        self._stats_dict['Матемтичне очікування'] = np.mean(self._model)
-        self._stats_dict['Дисперсія'] = np.var(self._model)
-        self._stats_dict['Стандартне відхилення'] = np.std(self._model)
+        accumulator = MomentsAccumulator()
+        sketch = QuantileSketch() if quantiles is not None else None
+        for chunk in chunks:
+            accumulator.update(chunk)
+            if sketch is not None:
+                sketch.update(chunk)
+
+        if sketch is None:
+            return accumulator.get_moments()
+        return accumulator.get_moments(), sketch.quantile(quantiles)
 
     def print_stats(self):
         """